@@ -0,0 +1,77 @@
+# Compares checking a ball against many boxes one pair at a time, with the
+# scalar glm check_ball_collision, and in a single check_ball_collisions pass.
+# The per-pair loop is timed on at most --sample boxes and scaled up.
+#
+#   python benchmarks/collision.py --counts 100 10000 1000000
+import os
+import sys
+import time
+import argparse
+
+# We dynamically add Elyria to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import glm
+import numpy as np
+from elyria import BallObject, GameObject, check_ball_collision, check_ball_collisions
+
+WIDTH = 800
+HEIGHT = 600
+
+
+# returns the top-left corners and sizes of count random boxes
+def random_boxes(count: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    positions = rng.uniform((0.0, 0.0), (WIDTH, HEIGHT), (count, 2)).astype(np.float32)
+    sizes = rng.uniform((10.0, 5.0), (60.0, 30.0), (count, 2)).astype(np.float32)
+    return positions, sizes
+
+
+# returns the seconds per box of the per-pair checks and the number of hits
+def per_pair(ball: BallObject, positions: np.ndarray, sizes: np.ndarray) -> tuple[float, int]:
+    boxes = [GameObject(position=glm.vec2(*position), size=glm.vec2(*size)) for position, size in zip(positions, sizes)]
+    start = time.perf_counter()
+    hits = sum(check_ball_collision(ball, box).is_collided for box in boxes)
+    return (time.perf_counter() - start) / len(boxes), hits
+
+
+# returns the best seconds of a batch check over a few repeats and the number of hits
+def batch(ball: BallObject, positions: np.ndarray, sizes: np.ndarray, repeats: int) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        hits, _, _ = check_ball_collisions(ball.position + ball.radius, ball.radius, positions, sizes)
+        best = min(best, time.perf_counter() - start)
+    return best, int(hits.sum())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 10_000, 1_000_000], help="boxes per check")
+    parser.add_argument("--sample", type=int, default=10_000, help="boxes the per-pair loop is timed on")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    ball = BallObject(glm.vec2(WIDTH / 2.0, HEIGHT / 2.0), 12.5)
+
+    print(f"{'boxes':>10} {'per pair (ms)':>14} {'batch (ms)':>11} {'speedup':>8} {'hits':>6}")
+    for count in args.counts:
+        positions, sizes = random_boxes(count, rng)
+        sample = min(count, args.sample)
+        pair_time, pair_hits = per_pair(ball, positions[:sample], sizes[:sample])
+        batch_time, hits = batch(ball, positions, sizes, args.repeats)
+
+        if sample == count and pair_hits != hits:
+            print(f"ERROR::COLLISION: per-pair and batch hits differ ({pair_hits} != {hits})")
+            sys.exit(1)
+
+        pair_total = pair_time * count
+        estimated = "*" if sample < count else " "
+        print(f"{count:>10} {pair_total * 1000.0:>13.2f}{estimated} {batch_time * 1000.0:>11.3f} {pair_total / batch_time:>7.0f}x {hits:>6}")
+    if any(count > args.sample for count in args.counts):
+        print(f"* estimated from {args.sample} boxes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Compares the CPU and GPU particle modes of ParticleGenerator: time spent per
+# frame in update() and in draw() (including glFinish, so GPU work is counted),
+# and the state calls GLState forwarded to OpenGL and avoided per frame.
+#
+#   python benchmarks/particles.py --amount 50000 --rate 1000
+import os
+import sys
+import time
+import argparse
+
+# We dynamically add Elyria to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import glm
+import numpy as np
+from OpenGL.GL import *
+from glfw.GLFW import *
+from elyria import base_dir, GameObject, GLState, ParticleGenerator, ParticleMode, ResourceManager, Texture2D
+
+WIDTH = 800
+HEIGHT = 600
+
+
+# creates an invisible window to get a current OpenGL 3.3 core context
+def create_context() -> None:
+    glfwInit()
+    glfwWindowHint(GLFW_CONTEXT_VERSION_MAJOR, 3)
+    glfwWindowHint(GLFW_CONTEXT_VERSION_MINOR, 3)
+    glfwWindowHint(GLFW_OPENGL_PROFILE, GLFW_OPENGL_CORE_PROFILE)
+    glfwWindowHint(GLFW_OPENGL_FORWARD_COMPAT, GL_TRUE)
+    glfwWindowHint(GLFW_VISIBLE, False)
+    window = glfwCreateWindow(WIDTH, HEIGHT, "benchmark", None, None)
+    if not window:
+        print("Failed to create GLFW window")
+        glfwTerminate()
+        sys.exit(1)
+    glfwMakeContextCurrent(window)
+    glViewport(0, 0, WIDTH, HEIGHT)
+    glEnable(GL_BLEND)
+
+
+def load_resources() -> Texture2D:
+    shaders = os.path.join(base_dir, "shaders")
+    ResourceManager.load_shader("particle", os.path.join(shaders, "particle.vs"), os.path.join(shaders, "particle.fs"))
+    ResourceManager.load_shader("particle_gpu", os.path.join(shaders, "particle_gpu.vs"), os.path.join(shaders, "particle.fs"))
+    matrices = ResourceManager.load_uniform_buffer("Matrices", glm.sizeof(glm.mat4), 0)
+    matrices.set_mat4(0, glm.ortho(0.0, float(WIDTH), float(HEIGHT), 0.0, -1.0, 1.0))
+    for name in ("particle", "particle_gpu"):
+        matrices.attach(ResourceManager.get_shader(name))
+        ResourceManager.get_shader(name).use()
+        ResourceManager.get_shader(name).set_int("sprite", 0)
+
+    # a single white texel is enough to exercise the fragment stage
+    texture = Texture2D(1, 1, GL_RGBA, GL_RGBA)
+    texture.generate(np.full((1, 1, 4), 255, dtype=np.uint8))
+    return texture
+
+
+# returns the average (update, draw) milliseconds and (issued, avoided) state
+# calls per frame
+def run(texture: Texture2D, mode: ParticleMode, amount: int, rate: int, frames: int, dt: float) -> tuple[float, float, float, float]:
+    generator = ParticleGenerator(texture, amount, mode=mode)
+    emitter = GameObject(position=glm.vec2(WIDTH / 2.0, HEIGHT / 2.0), velocity=glm.vec2(100.0, -350.0))
+
+    # fill the generator up to its steady state before measuring
+    for _ in range(int(1.0 / dt) + 1):
+        generator.update(dt, emitter, rate)
+
+    update_time = 0.0
+    draw_time = 0.0
+    issued = 0
+    avoided = 0
+    for _ in range(frames):
+        GLState.begin_frame()
+        start = time.perf_counter()
+        generator.update(dt, emitter, rate)
+        updated = time.perf_counter()
+        glClear(GL_COLOR_BUFFER_BIT)
+        generator.draw()
+        glFinish()
+        drawn = time.perf_counter()
+        update_time += updated - start
+        draw_time += drawn - updated
+
+        # closes the frame, so that its counts become the last frame's
+        GLState.begin_frame()
+        frame_issued, frame_avoided = GLState.frame_stats()
+        issued += frame_issued
+        avoided += frame_avoided
+
+    return update_time / frames * 1000.0, draw_time / frames * 1000.0, issued / frames, avoided / frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the CPU and GPU particle modes of ParticleGenerator.")
+    parser.add_argument("--amount", type=int, default=50000, help="particles per generator")
+    parser.add_argument("--rate", type=int, default=1000, help="particles spawned per frame")
+    parser.add_argument("--frames", type=int, default=300, help="measured frames")
+    parser.add_argument("--dt", type=float, default=1.0 / 60.0, help="frame time in seconds")
+    args = parser.parse_args()
+
+    create_context()
+    texture = load_resources()
+
+    print(f"{args.amount} particles, {args.rate} spawned per frame, {args.frames} frames")
+    print(f"{'mode':<6}{'update ms':>12}{'draw ms':>12}{'total ms':>12}{'GL calls':>12}{'avoided':>12}")
+    for mode in ParticleMode:
+        update_ms, draw_ms, issued, avoided = run(texture, mode, args.amount, args.rate, args.frames, args.dt)
+        print(f"{mode:<6}{update_ms:>12.3f}{draw_ms:>12.3f}{update_ms + draw_ms:>12.3f}{issued:>12.1f}{avoided:>12.1f}")
+
+    ResourceManager.clear()
+    glfwTerminate()
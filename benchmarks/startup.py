@@ -0,0 +1,87 @@
+# Measures the import time of every elyria module, each in a fresh interpreter,
+# and which heavy backends importing it loads. Simulation modules must stay
+# within the budget and free of backends, so that tools and headless runs
+# start fast; the exit status is 1 otherwise.
+#
+#   python benchmarks/startup.py --budget 50
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# modules measured, in order
+MODULES = [
+    "elyria",
+    "elyria.game_object",
+    "elyria.ball_object",
+    "elyria.collision",
+    "elyria.cache",
+    "elyria.texture_atlas",
+    "elyria.gl_state",
+    "elyria.texture2d",
+    "elyria.shader",
+    "elyria.sprite_renderer",
+    "elyria.particle",
+    "elyria.post_processor",
+    "elyria.resource_manager",
+    "elyria.text_renderer",
+    "elyria.audio_manager",
+    "elyria.game",
+    "elyria.core"
+]
+
+# modules that must import within the budget, without backends
+SIMULATION = {"elyria", "elyria.game_object", "elyria.ball_object", "elyria.collision", "elyria.cache"}
+
+BACKENDS = ["OpenGL", "glfw", "pygame", "freetype", "PIL", "numpy"]
+
+# run in the child interpreter: prints the import time and the loaded backends
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [name for name in {backends!r} if name in sys.modules]]))
+"""
+
+
+def measure(module: str) -> tuple[float, list[str]]:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, backends=BACKENDS)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    elapsed, backends = json.loads(result.stdout.strip().splitlines()[-1])
+    return elapsed, backends
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measures the import time of every elyria module and the backends it loads.")
+    parser.add_argument("--budget", type=float, default=50.0, help="import time budget of simulation modules, in ms")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<28} {'import (ms)':>12}  backends")
+    for module in MODULES:
+        try:
+            elapsed, backends = measure(module)
+        except RuntimeError as e:
+            print(f"{module:<28} {'error':>12}  {e}")
+            failed = failed or module in SIMULATION
+            continue
+
+        over = module in SIMULATION and (elapsed * 1000.0 > args.budget or set(backends) - {"numpy"})
+        failed = failed or over
+        print(f"{module:<28} {elapsed * 1000.0:>12.1f}  {', '.join(backends) or '-'}{'  OVER BUDGET' if over else ''}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 import glm
 import random
+import numpy as np
 from enum import StrEnum
-from OpenGL.GL import *
-from glfw.GLFW import *
+from typing import Callable, Optional
 from elyria.game import *
+from elyria.audio_manager import AudioManager
 
 from breakout.power_up import PowerUp
 from breakout.game_level import GameLevel
@@ -21,6 +22,9 @@ INITIAL_BALL_VELOCITY = glm.vec2(100.0, -350.0)
 # Radius of the ball object
 BALL_RADIUS = 12.5
 
+# candidate bricks from which on one batch check beats checking them one by one
+BATCH_CANDIDATES = 16
+
 
 # represents the current state of the game
 class GameState(StrEnum):
@@ -43,41 +47,17 @@ class Breakout(Game):
     def init(self) -> None:
         super().init()
 
-        # load textures
-        ResourceManager.load_texture("textures/background.jpg", False, "background")
-        ResourceManager.load_texture("textures/awesomeface.png", True, "face")
-        ResourceManager.load_texture("textures/block.png", False, "block")
-        ResourceManager.load_texture("textures/block_solid.png", False, "block_solid")
-        ResourceManager.load_texture("textures/paddle.png", True, "paddle")
-        ResourceManager.load_texture("textures/particle.png", True, "particle")
-        ResourceManager.load_texture("textures/powerup_speed.png", True, "powerup_speed")
-        ResourceManager.load_texture("textures/powerup_sticky.png", True, "powerup_sticky")
-        ResourceManager.load_texture("textures/powerup_increase.png", True, "powerup_increase")
-        ResourceManager.load_texture("textures/powerup_confuse.png", True, "powerup_confuse")
-        ResourceManager.load_texture("textures/powerup_chaos.png", True, "powerup_chaos")
-        ResourceManager.load_texture("textures/powerup_passthrough.png", True, "powerup_passthrough")
-
-        self.particles = ParticleGenerator(
-            ResourceManager.get_texture("particle"),
-            500
-        )
+        self.load_assets()
+
+        self.particles = self.create_particles(self.texture("particle"), 500)
 
         # load levels
-        self.levels.append(GameLevel("levels/1.lvl", self.width, self.height / 2))
-        self.levels.append(GameLevel("levels/2.lvl", self.width, self.height / 2))
-        self.levels.append(GameLevel("levels/3.lvl", self.width, self.height / 2))
-        self.levels.append(GameLevel("levels/4.lvl", self.width, self.height / 2))
+        self.levels.append(GameLevel("levels/1.lvl", self.width, self.height / 2, self.texture))
+        self.levels.append(GameLevel("levels/2.lvl", self.width, self.height / 2, self.texture))
+        self.levels.append(GameLevel("levels/3.lvl", self.width, self.height / 2, self.texture))
+        self.levels.append(GameLevel("levels/4.lvl", self.width, self.height / 2, self.texture))
         self.level = 0
 
-        # audio
-        ResourceManager.load_music("audio/breakout.mp3", "game_music")
-        ResourceManager.load_music("audio/bleep.mp3", "bleep1")  # the sound for when the ball hit a non-solid block. 
-        ResourceManager.load_music("audio/solid.wav", "solid")  # the sound for when the ball hit a solid block. 
-        ResourceManager.load_music("audio/powerup.wav", "powerup")  # the sound for when we the player paddle collided with a powerup block. 
-        ResourceManager.load_music("audio/bleep.wav", "bleep2")  # the sound for when we the ball bounces of the player paddle.
-
-        ResourceManager.play_music("game_music")
-
         player_pos = glm.vec2(
             self.width / 2.0 - PLAYER_SIZE.x / 2.0,
             self.height - PLAYER_SIZE.y
@@ -85,13 +65,49 @@ class Breakout(Game):
         self.player = GameObject(
             position=player_pos,
             size=PLAYER_SIZE,
-            texture=ResourceManager.get_texture("paddle")
+            texture=self.texture("paddle")
         )
 
         ball_pos = player_pos + glm.vec2(
             PLAYER_SIZE.x / 2.0 - BALL_RADIUS, -BALL_RADIUS * 2.0
         )
-        self.ball = BallObject(ball_pos, BALL_RADIUS, INITIAL_BALL_VELOCITY, ResourceManager.get_texture("face"))
+        self.ball = BallObject(ball_pos, BALL_RADIUS, INITIAL_BALL_VELOCITY, self.texture("face"))
+
+    def load_assets(self) -> None:
+        from elyria.resource_manager import ResourceManager
+
+        # load textures; the small sprites share an atlas so that they can be batched,
+        # decoded images are cached on disk to skip decoding on later starts
+        ResourceManager.pixel_cache = True
+        ResourceManager.load_textures([("textures/background.jpg", False, "background")])
+        ResourceManager.load_atlas("sprites", [
+            ("textures/awesomeface.png", True, "face"),
+            ("textures/block.png", False, "block"),
+            ("textures/block_solid.png", False, "block_solid"),
+            ("textures/paddle.png", True, "paddle"),
+            ("textures/particle.png", True, "particle"),
+            ("textures/powerup_speed.png", True, "powerup_speed"),
+            ("textures/powerup_sticky.png", True, "powerup_sticky"),
+            ("textures/powerup_increase.png", True, "powerup_increase"),
+            ("textures/powerup_confuse.png", True, "powerup_confuse"),
+            ("textures/powerup_chaos.png", True, "powerup_chaos"),
+            ("textures/powerup_passthrough.png", True, "powerup_passthrough")
+        ])
+
+        # audio
+        ResourceManager.load_stream("audio/breakout.mp3", "game_music")
+        ResourceManager.load_music("audio/bleep.mp3", "bleep1")  # the sound for when the ball hit a non-solid block. 
+        ResourceManager.load_music("audio/solid.wav", "solid")  # the sound for when the ball hit a solid block. 
+        ResourceManager.load_music("audio/powerup.wav", "powerup")  # the sound for when we the player paddle collided with a powerup block. 
+        ResourceManager.load_music("audio/bleep.wav", "bleep2")  # the sound for when we the ball bounces of the player paddle.
+
+        ResourceManager.play_music("game_music")
+
+        # sound effects: concurrent voices and priority
+        AudioManager.configure("bleep1", limit=2, priority=1)
+        AudioManager.configure("solid", limit=2, priority=1)
+        AudioManager.configure("powerup", limit=1, priority=2)
+        AudioManager.configure("bleep2", limit=1, priority=2)
 
     def process_input(self, dt: float) -> None:
         if self.state == GameState.GAME_MENU:
@@ -133,8 +149,8 @@ class Breakout(Game):
                 self.ball.stuck = False
 
     def update(self, dt: float) -> None:
-        # update objects
-        self.ball.move(dt, self.width)
+        # update objects; the ball bounces off the bricks and the paddle as it moves
+        self.ball.move(dt, self.width, self.ball_contact)
 
         # check for collisions
         self.do_collisions()
@@ -167,7 +183,12 @@ class Breakout(Game):
             self.effects.chaos = True
             self.state = GameState.GAME_WIN
 
-    def render(self) -> None:
+    def save_state(self) -> None:
+        super().save_state()
+        for powerup in self.powerups:
+            powerup.save_state()
+
+    def render(self, alpha: float = 1.0) -> None:
         if (
             self.state == GameState.GAME_ACTIVE or 
             self.state == GameState.GAME_MENU or
@@ -176,9 +197,12 @@ class Breakout(Game):
             # begin rendering to postprocessing framebuffer
             self.effects.begin_render()
 
+            # batch all sprites drawn before the particles into instanced draws
+            self.renderer.begin()
+
             # draw background
             self.renderer.draw_sprite(
-                ResourceManager.get_texture("background"),
+                self.texture("background"),
                 glm.vec2(0.0, 0.0),
                 glm.vec2(self.width, self.height),
                 0.0
@@ -188,24 +212,26 @@ class Breakout(Game):
             self.levels[self.level].draw(self.renderer)
 
             # draw player
-            self.player.draw(self.renderer)
+            self.player.draw(self.renderer, alpha)
 
             # draw powerups
             for powerup in self.powerups:
                 if not powerup.destroyed:
-                    powerup.draw(self.renderer)
+                    powerup.draw(self.renderer, alpha)
+
+            self.renderer.flush()
 
             # draw particles
             self.particles.draw()
 
             # draw ball
-            self.ball.draw(self.renderer)
+            self.ball.draw(self.renderer, alpha)
 
             # end rendering to postprocessing framebuffer
             self.effects.end_render()
 
             # render postprocessing quad
-            self.effects.render(glfwGetTime())
+            self.effects.render(self.time)
 
             # render text (don't include postprocessing)
             self.text.render_text(f"Lives: {self.lives}", 5.0, 5.0, 1.0)
@@ -218,48 +244,69 @@ class Breakout(Game):
             self.text.render_text("You WON!!!", 320.0, self.height / 2.0 - 20.0, 1.0, glm.vec3(0.0, 1.0, 0.0))
             self.text.render_text("Press ENTER to retry or ESC to quit", 130.0, self.height / 2.0, 1.0, glm.vec3(1.0, 1.0, 0.0))
 
+    # earliest contact of the ball moving by displacement with a brick or the
+    # paddle (from above), and the hit response to it
+    def ball_contact(self, ball: BallObject, displacement: glm.vec2) -> Optional[tuple[float, Callable[[], None]]]:
+        level = self.levels[self.level]
+        end = ball.position + displacement
+        candidates = level.query(glm.min(ball.position, end), glm.max(ball.position, end) + ball.size)
+        times, normals = sweep_ball_collisions(
+            ball.position + ball.radius,
+            ball.radius,
+            displacement,
+            np.vstack((level.positions[candidates], np.array(self.player.position, dtype=np.float32))),
+            np.vstack((level.sizes[candidates], np.array(self.player.size, dtype=np.float32)))
+        )
+        # the paddle only bounces the ball off its top
+        if vector_direction(-glm.vec2(normals[-1])) != Direction.UP:
+            times[-1] = np.inf
+
+        index = int(np.argmin(times))
+        if not np.isfinite(times[index]):
+            return None
+        if index == len(candidates):
+            return times[index], self.hit_paddle
+        box = level.bricks[candidates[index]]
+        direction = vector_direction(-glm.vec2(normals[index]))
+        return times[index], lambda: self.hit_brick(box, direction)
+
+    # resolves the ball overlapping bricks or the paddle, which the swept
+    # contacts leave out (e.g. the paddle pushed into the ball), and the
+    # powerups reaching the paddle
     def do_collisions(self):
-        for box in self.levels[self.level].bricks:
+        # only the bricks in the grid cells the ball swept through this step;
+        # many of them are narrowed down to the overlapped ones in one pass
+        level = self.levels[self.level]
+        ball = self.ball
+        swept_min = glm.min(ball.previous_position, ball.position)
+        swept_max = glm.max(ball.previous_position, ball.position) + ball.size
+        candidates = level.query(swept_min, swept_max)
+        if len(candidates) >= BATCH_CANDIDATES:
+            hits, _, _ = check_ball_collisions(
+                ball.position + ball.radius,
+                ball.radius,
+                level.positions[candidates],
+                level.sizes[candidates]
+            )
+            candidates = [candidates[i] for i in hits.nonzero()[0]]
+
+        for box in (level.bricks[index] for index in candidates):
+            # resolving an earlier hit moves the ball, so check again
             if not box.destroyed:
                 collision = check_ball_collision(self.ball, box)
                 if collision.is_collided:
-                    # destroy block if not solid
-                    if not box.is_solid:
-                        box.destroyed = True
-                        self.spawn_power_ups(box)
-                        ResourceManager.play_music("bleep1")
-                    else:  # if block is solid, enable shake effect
-                        self.shake_time = 0.05
-                        self.effects.shake = True
-                        ResourceManager.play_music("solid")
-
-                    # collision resolution
                     direction = collision.direction
                     diff_vector = collision.difference
-                    if not (self.ball.pass_through and not box.is_solid):
-                        if direction == Direction.LEFT or direction == Direction.RIGHT:  # horizontal collision
-                            self.ball.velocity.x = -self.ball.velocity.x  # reverse horizontal velocity
-
-                            # relocate
-                            penetration = self.ball.radius - abs(diff_vector.x)
-                            if direction == Direction.LEFT:
-                                self.ball.position.x += penetration  # move ball to right
-                            else:
-                                self.ball.position.x -= penetration  # move ball to left
-                        else:  # vertical collision
-                            self.ball.velocity.y = -self.ball.velocity.y  # reverse vertical velocity
-
-                            # relocate
-                            penetration = self.ball.radius - abs(diff_vector.y)
-                            if direction == Direction.UP:
-                                self.ball.position.y -= penetration  # move ball back up
-                            else:
-                                self.ball.position.y += penetration  # move ball back down
+                    if direction == Direction.LEFT or direction == Direction.RIGHT:  # horizontal collision
+                        penetration = self.ball.radius - abs(diff_vector.x)
+                    else:  # vertical collision
+                        penetration = self.ball.radius - abs(diff_vector.y)
+                    self.hit_brick(box, direction, penetration)
 
         # also check collisions on PowerUps and if so, activate them
         for powerup in self.powerups:
             if not powerup.destroyed:
-                # first check if powerup passed bottom edge, if so: keep as inactive and destroy
+                # first check if powerup passed bottom edge, if so: keep as inactive and destroy
                 if powerup.position.y >= self.height:
                     powerup.destroyed = True
 
@@ -268,27 +315,60 @@ class Breakout(Game):
                     self.activate_power_up(powerup)
                     powerup.destroyed = True
                     powerup.activated = True
-                    ResourceManager.play_music("powerup")
+                    self.play_sound("powerup")
 
         # and finally check collisions for player pad (unless stuck)
         result = check_ball_collision(self.ball, self.player)
         if not self.ball.stuck and result.is_collided and result.direction == Direction.UP:
-            # check where it hit the board, and change velocity based on where it hit the board
-            center_board = self.player.position.x + self.player.size.x / 2.0
-            distance = (self.player.position.x + self.ball.radius) - center_board
-            percentage = distance / (self.player.size.x / 2.0)
-
-            # then move accordingly
-            strength = 2.0
-            old_velocity = self.ball.velocity
-            self.ball.velocity.x = INITIAL_BALL_VELOCITY.x * percentage * strength
-            self.ball.velocity.y = -1.0 * abs(self.ball.velocity.y)
-            self.ball.velocity = glm.normalize(self.ball.velocity) * glm.length(old_velocity)
-
-            # if Sticky powerup is activated, also stick ball to paddle once new velocity vectors were calculated
-            self.ball.stuck = self.ball.sticky
-
-            ResourceManager.play_music("bleep2")
+            self.hit_paddle()
+
+    # hit response of the ball and a brick. direction: where the brick is
+    # relative to the ball; penetration: how far they overlap
+    def hit_brick(self, box: GameObject, direction: Direction, penetration: float = 0.0) -> None:
+        # destroy block if not solid
+        if not box.is_solid:
+            self.levels[self.level].destroy_brick(box)
+            self.spawn_power_ups(box)
+            self.play_sound("bleep1")
+        else:  # if block is solid, enable shake effect
+            self.shake_time = 0.05
+            self.effects.shake = True
+            self.play_sound("solid")
+
+        # collision resolution: send the ball away from the brick
+        if self.ball.pass_through and not box.is_solid:
+            return
+        if direction == Direction.LEFT:
+            self.ball.velocity.x = abs(self.ball.velocity.x)
+            self.ball.position.x += penetration  # move ball to right
+        elif direction == Direction.RIGHT:
+            self.ball.velocity.x = -abs(self.ball.velocity.x)
+            self.ball.position.x -= penetration  # move ball to left
+        elif direction == Direction.UP:
+            self.ball.velocity.y = -abs(self.ball.velocity.y)
+            self.ball.position.y -= penetration  # move ball back up
+        else:
+            self.ball.velocity.y = abs(self.ball.velocity.y)
+            self.ball.position.y += penetration  # move ball back down
+
+    # hit response of the ball and the top of the paddle
+    def hit_paddle(self) -> None:
+        # check where it hit the board, and change velocity based on where it hit the board
+        center_board = self.player.position.x + self.player.size.x / 2.0
+        distance = (self.player.position.x + self.ball.radius) - center_board
+        percentage = distance / (self.player.size.x / 2.0)
+
+        # then move accordingly
+        strength = 2.0
+        old_velocity = self.ball.velocity
+        self.ball.velocity.x = INITIAL_BALL_VELOCITY.x * percentage * strength
+        self.ball.velocity.y = -1.0 * abs(self.ball.velocity.y)
+        self.ball.velocity = glm.normalize(self.ball.velocity) * glm.length(old_velocity)
+
+        # if Sticky powerup is activated, also stick ball to paddle once new velocity vectors were calculated
+        self.ball.stuck = self.ball.sticky
+
+        self.play_sound("bleep2")
 
     # reset
     def reset_level(self) -> None:
@@ -309,6 +389,10 @@ class Breakout(Game):
             INITIAL_BALL_VELOCITY
         )
 
+        # don't interpolate from where they were before the reset
+        self.player.save_state()
+        self.ball.save_state()
+
     def should_spawn(self, chance: int) -> bool:
         rdn = random.randint(0, chance - 1)
         return rdn == 0
@@ -321,7 +405,7 @@ class Breakout(Game):
                 color=glm.vec3(0.5, 0.5, 1.0),
                 duration=5,
                 position=block.position,
-                texture=ResourceManager.get_texture("powerup_speed")
+                texture=self.texture("powerup_speed")
             ))
         if self.should_spawn(75):
             self.powerups.append(PowerUp(
@@ -329,7 +413,7 @@ class Breakout(Game):
                 color=glm.vec3(1.0, 0.5, 1.0),
                 duration=20.0,
                 position=block.position,
-                texture=ResourceManager.get_texture("powerup_sticky")
+                texture=self.texture("powerup_sticky")
             ))
         if self.should_spawn(75):
             self.powerups.append(PowerUp(
@@ -337,7 +421,7 @@ class Breakout(Game):
                 color=glm.vec3(0.5, 1.0, 0/5),
                 duration=10.0,
                 position=block.position,
-                texture=ResourceManager.get_texture("powerup_passthrough")
+                texture=self.texture("powerup_passthrough")
             ))
         if self.should_spawn(75):
             self.powerups.append(PowerUp(
@@ -345,7 +429,7 @@ class Breakout(Game):
                 color=glm.vec3(1.0, 0.3, 0.3),
                 duration=0.0,
                 position=block.position,
-                texture=ResourceManager.get_texture("powerup_increase")
+                texture=self.texture("powerup_increase")
             ))
         # Negative powerups should spawn more often
         if self.should_spawn(15):
@@ -354,7 +438,7 @@ class Breakout(Game):
                 color=glm.vec3(1.0, 0.3, 0.3),
                 duration=15.0,
                 position=block.position,
-                texture=ResourceManager.get_texture("powerup_confuse")
+                texture=self.texture("powerup_confuse")
             ))
         if self.should_spawn(15):
             self.powerups.append(PowerUp(
@@ -362,7 +446,7 @@ class Breakout(Game):
                 color=glm.vec3(0.9, 0.25, 0.25),
                 duration=15.0,
                 position=block.position,
-                texture=ResourceManager.get_texture("powerup_chaos")
+                texture=self.texture("powerup_chaos")
             ))
 
     def update_power_ups(self, dt: float) -> None:
@@ -1,12 +1,34 @@
+import math
 import numpy as np
 import glm
-from elyria import GameObject, SpriteRenderer, ResourceManager
+from elyria import GameObject
+from typing import Callable, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from elyria.sprite_renderer import SpriteRenderer, StaticSpriteBatch
+    from elyria.texture2d import Texture2D
 
 
 class GameLevel:
-    def __init__(self, file: str, level_width: int, level_height: int):
+    # texture: looks up the brick textures by name (see Game.texture)
+    def __init__(self, file: str, level_width: int, level_height: int, texture: Callable[[str], Optional["Texture2D"]]):
         # level state
         self.bricks: list[GameObject] = []
+        self.texture = texture
+
+        # bricks baked into GPU memory on first draw; destroyed bricks are hidden in place
+        self.batch: Optional["StaticSpriteBatch"] = None
+
+        # top-left corners and sizes of the bricks, (n, 2), for batch collision checks
+        self.positions = np.zeros((0, 2), dtype=np.float32)
+        self.sizes = np.zeros((0, 2), dtype=np.float32)
+
+        # broadphase: (column, row) grid cell -> index of the brick left in it
+        self.grid: dict[tuple[int, int], int] = {}
+        self.columns = 0
+        self.rows = 0
+        self.unit_width = 1.0
+        self.unit_height = 1.0
 
         self.load(file, level_width, level_height)
 
@@ -14,6 +36,12 @@ class GameLevel:
     def load(self, file: str, level_width: int, level_height: int) -> None:
         # clear old data
         self.bricks.clear()
+        self.grid.clear()
+        self.positions = np.zeros((0, 2), dtype=np.float32)
+        self.sizes = np.zeros((0, 2), dtype=np.float32)
+        if self.batch is not None:
+            self.batch.delete()
+            self.batch = None
 
         # load from file
         tile_data = []
@@ -30,10 +58,50 @@ class GameLevel:
             self.init(tile_data, level_width, level_height)
 
     # render level
-    def draw(self, renderer: SpriteRenderer) -> None:
-        for tile in self.bricks:
-            if not tile.destroyed:
-                tile.draw(renderer)
+    def draw(self, renderer: "SpriteRenderer") -> None:
+        if renderer.instanced_shader is None:
+            for tile in self.bricks:
+                if not tile.destroyed:
+                    tile.draw(renderer)
+            return
+
+        if self.batch is None:
+            from elyria.sprite_renderer import StaticSpriteBatch
+
+            self.batch = StaticSpriteBatch(renderer, [tile for tile in self.bricks if not tile.destroyed])
+        renderer.draw_static(self.batch)
+
+    # destroys a brick, only updating its own slot of the baked level geometry
+    def destroy_brick(self, brick: GameObject) -> None:
+        brick.destroyed = True
+        self.grid.pop(self.cell(brick.position + brick.size / 2.0), None)
+        if self.batch is not None:
+            self.batch.hide(brick)
+
+    # grid cell containing a point, clamped to the level
+    def cell(self, point: glm.vec2) -> tuple[int, int]:
+        return (
+            min(max(math.floor(point.x / self.unit_width), 0), self.columns - 1),
+            min(max(math.floor(point.y / self.unit_height), 0), self.rows - 1)
+        )
+
+    # returns the indices of the bricks left in the grid cells overlapped by a
+    # box, in the order they were loaded
+    def query(self, box_min: glm.vec2, box_max: glm.vec2) -> list[int]:
+        if not self.grid or box_max.x < 0.0 or box_max.y < 0.0:
+            return []
+        if box_min.x >= self.columns * self.unit_width or box_min.y >= self.rows * self.unit_height:
+            return []
+
+        min_x, min_y = self.cell(box_min)
+        max_x, max_y = self.cell(box_max)
+        bricks = []
+        for y in range(min_y, max_y + 1):
+            for x in range(min_x, max_x + 1):
+                index = self.grid.get((x, y))
+                if index is not None:
+                    bricks.append(index)
+        return bricks
 
     def init(self, tile_data: list[list[int]], level_width: int, level_height: int) -> None:
         # calculate dimensions
@@ -41,6 +109,10 @@ class GameLevel:
         width = len(tile_data[0]) if height > 0 else 0
         unit_width = level_width / width
         unit_height = level_height / height
+        self.columns = width
+        self.rows = height
+        self.unit_width = unit_width
+        self.unit_height = unit_height
 
         # initialize level tiles based on tile_data
         for y, row in enumerate(tile_data):
@@ -52,10 +124,11 @@ class GameLevel:
                     obj = GameObject(
                         position=pos,
                         size=size,
-                        texture=ResourceManager.get_texture("block_solid"),
+                        texture=self.texture("block_solid"),
                         color=glm.vec3(0.8, 0.8, 0.7),
                         is_solid=True
                     )
+                    self.grid[(x, y)] = len(self.bricks)
                     self.bricks.append(obj)
                 elif tile_code > 1:  # Non-solid blocks with varying colors
                     color = glm.vec3(1.0, 1.0, 1.0)  # Default to white
@@ -71,12 +144,16 @@ class GameLevel:
                     obj = GameObject(
                         position=pos,
                         size=size,
-                        texture=ResourceManager.get_texture("block"),
+                        texture=self.texture("block"),
                         color=color,
                         is_solid=False
                     )
+                    self.grid[(x, y)] = len(self.bricks)
                     self.bricks.append(obj)
 
+        self.positions = np.array([tile.position for tile in self.bricks], dtype=np.float32).reshape(-1, 2)
+        self.sizes = np.array([tile.size for tile in self.bricks], dtype=np.float32).reshape(-1, 2)
+
     def is_completed(self) -> bool:
         for tile in self.bricks:
             if not tile.is_solid and not tile.destroyed:
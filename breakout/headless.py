@@ -0,0 +1,52 @@
+# Runs Breakout without a window, GL context or audio: a bot starts the game,
+# launches the ball and keeps the paddle under it, and the simulated frames
+# per second are reported.
+#
+#   python breakout/headless.py --seconds 60
+import sys
+import os
+import argparse
+
+# We dynamically add Elyria to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from elyria.keys import GLFW_KEY_A, GLFW_KEY_D, GLFW_KEY_ENTER, GLFW_KEY_SPACE
+from elyria.headless import headless, run
+from game import Breakout
+
+
+# synthetic input: start the game, launch the ball and follow it with the paddle
+def bot(game: Breakout, frame: int) -> None:
+    game.keys[GLFW_KEY_ENTER] = frame % 120 == 0
+    if not game.keys[GLFW_KEY_ENTER]:
+        game.keys_processed[GLFW_KEY_ENTER] = False
+    game.keys[GLFW_KEY_SPACE] = True
+
+    paddle = game.player.position.x + game.player.size.x / 2.0
+    ball = game.ball.position.x + game.ball.radius
+    game.keys[GLFW_KEY_A] = ball < paddle - 10.0
+    game.keys[GLFW_KEY_D] = ball > paddle + 10.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=60.0, help="simulated play time")
+    parser.add_argument("--dt", type=float, default=1.0 / 60.0, help="frame time, in seconds")
+    args = parser.parse_args()
+
+    # levels are loaded relative to the game directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    game = headless(Breakout)()
+    game.init()
+    stats = run(game, args.seconds, args.dt, bot)
+
+    bricks = sum(brick.destroyed for level in game.levels for brick in level.bricks)
+    print(f"simulated {stats['frames']} frames ({args.seconds:.1f} s) in {stats['seconds']:.2f} s")
+    print(f"simulated frames per second: {stats['fps']:.0f}")
+    print(f"simulation steps: {stats['steps']} (merged {stats['merged']}, dropped {stats['dropped']})")
+    print(f"state: {game.state}, level {game.level + 1}, lives {game.lives}, bricks destroyed {bricks}")
+
+
+if __name__ == "__main__":
+    main()
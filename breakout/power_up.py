@@ -1,5 +1,9 @@
 import glm
-from elyria import GameObject, Texture2D
+from elyria import GameObject
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from elyria.texture2d import Texture2D
 
 
 # The size of a PowerUp block
@@ -14,7 +18,7 @@ VELOCITY = glm.vec2(0.0, 150.0)
 # active duration and whether it is activated or not.
 # The type op PowerUp is stored as a string
 class PowerUp(GameObject):
-    def __init__(self, type: str, color: glm.vec3, duration: float, position: glm.vec2, texture: Texture2D):
+    def __init__(self, type: str, color: glm.vec3, duration: float, position: glm.vec2, texture: "Texture2D"):
         super().__init__(
             position=position,
             size=POWERUP_SIZE,
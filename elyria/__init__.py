@@ -1,31 +1,72 @@
 from pathlib import Path
 base_dir = Path(__file__).resolve().parent
 
-from elyria.ball_object import BallObject
-from elyria.collision import Direction, Collision, vector_direction, check_ball_collision, check_collision
-from elyria.core import main
-from elyria.game_object import GameObject
-from elyria.game import Game
-from elyria.particle import Particle, ParticleGenerator
-from elyria.post_processor import PostProcessor
-from elyria.resource_manager import ResourceManager
-from elyria.shader import Shader
-from elyria.sprite_renderer import SpriteRenderer
-from elyria.text_renderer import Character, TextRenderer
-from elyria.texture2d import Texture2D
+import importlib
+
+
+# public name -> module defining it. Submodules are only imported once one of
+# their names is used, so that importing elyria (or only its simulation code,
+# e.g. elyria.collision) doesn't load OpenGL, glfw, pygame or freetype.
+_exports = {
+    "AudioManager": "audio_manager",
+    "BallObject": "ball_object",
+    "Direction": "collision", "Collision": "collision", "vector_direction": "collision",
+    "check_ball_collision": "collision", "check_ball_collisions": "collision", "sweep_ball_collisions": "collision",
+    "check_collision": "collision",
+    "main": "core",
+    "FixedTimestep": "fixed_timestep",
+    "GameObject": "game_object",
+    "Game": "game",
+    "GLState": "gl_state",
+    "HeadlessGame": "headless",
+    "ParticleMode": "particle", "ParticleGenerator": "particle",
+    "PostProcessor": "post_processor",
+    "ResolutionController": "resolution_controller",
+    "ResourceManager": "resource_manager",
+    "Shader": "shader",
+    "SpriteRenderer": "sprite_renderer", "StaticSpriteBatch": "sprite_renderer",
+    "Character": "text_renderer", "TextRenderer": "text_renderer",
+    "Texture2D": "texture2d",
+    "SubTexture2D": "texture_atlas", "ShelfPacker": "texture_atlas",
+    "TextureHandle": "texture_residency", "TextureResidency": "texture_residency",
+    "UniformBuffer": "uniform_buffer"
+}
+
+
+def __getattr__(name: str):
+    module = _exports.get(name)
+    if module is None:
+        raise AttributeError(f"module 'elyria' has no attribute '{name}'")
+    value = getattr(importlib.import_module(f"elyria.{module}"), name)
+    # cache it, later lookups don't go through __getattr__ anymore
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + list(_exports))
 
 
 __all__ = [
+    "AudioManager",
     "BallObject",
-    "Direction", "Collision", "vector_direction", "check_ball_collision", "check_collision",
+    "Direction", "Collision", "vector_direction", "check_ball_collision", "check_ball_collisions", "sweep_ball_collisions",
+    "check_collision",
     "main",
+    "FixedTimestep",
     "GameObject",
     "Game",
-    "Particle", "ParticleGenerator",
+    "GLState",
+    "HeadlessGame",
+    "ParticleMode", "ParticleGenerator",
     "PostProcessor",
+    "ResolutionController",
     "ResourceManager",
     "Shader",
-    "SpriteRenderer",
+    "SpriteRenderer", "StaticSpriteBatch",
     "Character", "TextRenderer",
-    "Texture2D"
+    "Texture2D",
+    "SubTexture2D", "ShelfPacker",
+    "TextureHandle", "TextureResidency",
+    "UniformBuffer"
 ]
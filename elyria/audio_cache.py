@@ -0,0 +1,46 @@
+import os
+import numpy as np
+from pygame import mixer
+from elyria.cache import cache_path, source_key
+from typing import Optional
+
+# bytes written to the cache at a time
+WRITE_CHUNK = 1024 * 1024
+
+
+# returns the cache file holding the decoded PCM of an audio file, in the
+# format the mixer was initialized with
+def pcm_cache_file(file: str) -> str:
+    return cache_path("audio", f"{source_key([file], mixer.get_init())}.pcm")
+
+
+# memory-maps the cached PCM of an audio file, or returns None if it isn't cached
+def load_pcm(file: str) -> Optional[np.ndarray]:
+    try:
+        pcm_file = pcm_cache_file(file)
+    except OSError:
+        return None
+    if not os.path.exists(pcm_file) or os.path.getsize(pcm_file) == 0:
+        return None
+    return np.memmap(pcm_file, dtype=np.uint8, mode="r")
+
+
+# stores decoded PCM in the cache. pcm may be any buffer (e.g. Sound.get_view());
+# it's written a chunk at a time, without copying it whole
+def store_pcm(file: str, pcm) -> None:
+    try:
+        pcm_file = pcm_cache_file(file)
+        data = memoryview(pcm).cast("B")
+        # write next to the final file first, so an interrupted write is never picked up
+        with open(pcm_file + ".tmp", "wb") as f:
+            for start in range(0, len(data), WRITE_CHUNK):
+                f.write(data[start:start + WRITE_CHUNK])
+        os.replace(pcm_file + ".tmp", pcm_file)
+    except OSError as e:
+        print(f"ERROR::AUDIO: Failed to cache PCM of {file}\n{e}")
+
+
+# returns the size in bytes of one sample frame (a sample of every channel) of the mixer
+def frame_size() -> int:
+    _, size, channels = mixer.get_init()
+    return channels * abs(size) // 8
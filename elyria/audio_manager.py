@@ -0,0 +1,119 @@
+from typing import Optional, TYPE_CHECKING
+
+# pygame is only imported once the voice pool is set up, and the sounds are
+# looked up once they are played, so that games import without audio or OpenGL
+if TYPE_CHECKING:
+    from pygame import mixer
+
+
+# number of mixer channels sound effects are played on
+DEFAULT_VOICES = 8
+
+
+# Plays the sounds stored in the ResourceManager on a fixed pool of mixer
+# channels (voices). Sounds triggered during a frame are only recorded; flush()
+# starts each of them once, however often it was triggered, so the cost of
+# audio stays bounded. Every sound can be limited to a number of concurrent
+# voices, and when all voices are busy a sound only takes over the voice of a
+# lower priority sound.
+class AudioManager:
+    channels: list["mixer.Channel"] = []
+    # channel index -> (sound name, priority, start order) of the sound it plays
+    voices: dict[int, tuple[str, int, int]] = {}
+    # sound name -> (concurrent voice limit, priority)
+    settings: dict[str, tuple[int, int]] = {}
+    # sounds triggered since the last flush
+    pending: set[str] = set()
+    started = 0
+
+    # statistics: triggers, voices started, triggers merged into another one of
+    # the same frame and sounds dropped for lack of a voice
+    triggered = 0
+    played = 0
+    coalesced = 0
+    dropped = 0
+
+    # reserves the voice pool; the mixer must be initialized. Channels beyond the
+    # pool stay available to Sound.play (e.g. ResourceManager.play_music)
+    @staticmethod
+    def init(voices: int = DEFAULT_VOICES) -> None:
+        from pygame import mixer
+
+        mixer.set_num_channels(max(mixer.get_num_channels(), voices + DEFAULT_VOICES))
+        mixer.set_reserved(voices)
+        AudioManager.channels = [mixer.Channel(i) for i in range(voices)]
+        AudioManager.voices.clear()
+        AudioManager.pending.clear()
+
+    # sets how many voices a sound may use at once and its priority (higher wins)
+    @staticmethod
+    def configure(name: str, limit: int = 2, priority: int = 0) -> None:
+        AudioManager.settings[name] = (limit, priority)
+
+    # triggers a stored sound; it starts on the next flush
+    @staticmethod
+    def play(name: str) -> None:
+        AudioManager.triggered += 1
+        if name in AudioManager.pending:
+            AudioManager.coalesced += 1
+        else:
+            AudioManager.pending.add(name)
+
+    # starts the sounds triggered since the last flush, highest priority first;
+    # should be called once per frame
+    @staticmethod
+    def flush() -> None:
+        if not AudioManager.pending:
+            return
+        from elyria.resource_manager import ResourceManager
+
+        pending = sorted(AudioManager.pending, key=lambda name: -AudioManager.settings.get(name, (2, 0))[1])
+        AudioManager.pending.clear()
+
+        # forget voices that finished playing
+        for index in list(AudioManager.voices):
+            if not AudioManager.channels[index].get_busy():
+                del AudioManager.voices[index]
+
+        for name in pending:
+            sound = ResourceManager.audios.get(name)
+            if sound is None:
+                continue
+            limit, priority = AudioManager.settings.get(name, (2, 0))
+
+            # at its limit, a sound restarts its oldest voice
+            playing = [index for index, voice in AudioManager.voices.items() if voice[0] == name]
+            if len(playing) >= limit:
+                index = min(playing, key=lambda index: AudioManager.voices[index][2])
+            else:
+                index = AudioManager.free_voice(priority)
+            if index is None:
+                AudioManager.dropped += 1
+                continue
+
+            AudioManager.channels[index].play(sound)
+            AudioManager.voices[index] = (name, priority, AudioManager.started)
+            AudioManager.started += 1
+            AudioManager.played += 1
+
+    # returns an idle voice, or else the oldest voice playing a sound of lower
+    # priority, or None
+    @staticmethod
+    def free_voice(priority: int) -> Optional[int]:
+        for index in range(len(AudioManager.channels)):
+            if index not in AudioManager.voices:
+                return index
+        lower = [index for index, voice in AudioManager.voices.items() if voice[1] < priority]
+        if not lower:
+            return None
+        return min(lower, key=lambda index: (AudioManager.voices[index][1], AudioManager.voices[index][2]))
+
+    # returns the triggers, started voices, coalesced triggers and dropped sounds so far
+    @staticmethod
+    def stats() -> dict[str, int]:
+        return {
+            "triggered": AudioManager.triggered,
+            "played": AudioManager.played,
+            "coalesced": AudioManager.coalesced,
+            "dropped": AudioManager.dropped
+        }
@@ -1,7 +1,18 @@
 import glm
 from elyria.game_object import GameObject
-from elyria.texture2d import Texture2D
-from typing import Optional
+from typing import Callable, Optional, TYPE_CHECKING
+
+# only needed for annotations; importing it would pull in OpenGL
+if TYPE_CHECKING:
+    from elyria.texture2d import Texture2D
+
+# distance the ball stops short of a contact, so that it doesn't end up
+# overlapping what it hit through rounding
+CONTACT_SKIN = 0.01
+
+# finds the earliest contact of a ball moving by a displacement: returns the
+# fraction of the displacement to it and a callback resolving it, or None
+ContactFunction = Callable[["BallObject", glm.vec2], Optional[tuple[float, Callable[[], None]]]]
 
 
 class BallObject(GameObject):
@@ -10,7 +21,7 @@ class BallObject(GameObject):
         position: glm.vec2,
         radius: float = 12.5,
         velocity: glm.vec2 = glm.vec2(0.0, 0.0),
-        sprite: Optional[Texture2D] = None,
+        sprite: Optional["Texture2D"] = None,
         stuck: bool = True,
         sticky: bool = False,
         pass_through: bool = False
@@ -26,26 +37,48 @@ class BallObject(GameObject):
         self.sticky = sticky
         self.pass_through = pass_through
 
-    def move(self, dt: float, window_width: int) -> glm.vec2:
+    # moves the ball for dt seconds. With a contact function, the ball advances
+    # to the earliest contact, resolves it and moves on for the rest of the
+    # step (for up to max_contacts contacts), so that it can't pass through
+    # thin objects however fast it moves.
+    def move(self, dt: float, window_width: int, contact: Optional[ContactFunction] = None, max_contacts: int = 8) -> glm.vec2:
         # if not stuck to player board
         if not self.stuck:
-            # move ball
-            self.position += self.velocity * dt
-
-            # check if outside window bounds; if so, reverse velocity and restore at correct position
-            if self.position.x <= 0.0:
-                self.velocity.x = -self.velocity.x
-                self.position.x = 0.0
-            elif self.position.x + self.size.x >= window_width:
-                self.velocity.x = -self.velocity.x
-                self.position.x = window_width - self.size.x
-            
-            if self.position.y <= 0.0:
-                self.velocity.y = -self.velocity.y
-                self.position.y = 0.0
-            
+            remaining = dt
+            for contacts in range(max_contacts + 1):
+                displacement = self.velocity * remaining
+                hit = contact(self, displacement) if contact is not None and contacts < max_contacts else None
+                if hit is None:
+                    # move ball
+                    self.position += displacement
+                    self.bounce(window_width)
+                    break
+
+                fraction, resolve = hit
+                distance = glm.length(displacement)
+                fraction = max(fraction - CONTACT_SKIN / distance, 0.0) if distance > 0.0 else 0.0
+                self.position += displacement * fraction
+                self.bounce(window_width)
+                remaining *= 1.0 - fraction
+                resolve()
+                if self.stuck:
+                    break
+
         return self.position
 
+    # check if outside window bounds; if so, send the ball back and restore it at the correct position
+    def bounce(self, window_width: int) -> None:
+        if self.position.x <= 0.0:
+            self.velocity.x = abs(self.velocity.x)
+            self.position.x = 0.0
+        elif self.position.x + self.size.x >= window_width:
+            self.velocity.x = -abs(self.velocity.x)
+            self.position.x = window_width - self.size.x
+
+        if self.position.y <= 0.0:
+            self.velocity.y = abs(self.velocity.y)
+            self.position.y = 0.0
+
     def reset(self, position: glm.vec2, velocity: glm.vec2) -> None:
         self.position = position
         self.velocity = velocity
@@ -0,0 +1,30 @@
+import os
+import hashlib
+from elyria import base_dir
+from typing import Iterable
+
+
+# root directory of the on-disk caches, anchored to the engine rather than the
+# working directory, so that running a game from elsewhere reuses the same
+# caches instead of scattering new ones around
+cache_dir = os.path.join(base_dir, ".cache")
+
+
+# returns the path of a file in the named cache, creating the cache directory on demand
+def cache_path(cache: str, file: str) -> str:
+    directory = os.path.join(cache_dir, cache)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, file)
+
+
+# hashes the identity (path, size and modification time) of the source files and
+# any extra parameters, so that cached data derived from them is invalidated as
+# soon as one of them changes
+def source_key(files: Iterable[str], *extra) -> str:
+    digest = hashlib.sha1()
+    for file in files:
+        stat = os.stat(file)
+        digest.update(f"{os.path.abspath(file)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    for value in extra:
+        digest.update(f"{value!r}\n".encode())
+    return digest.hexdigest()
@@ -1,9 +1,14 @@
 import glm
 from enum import Enum
-from typing import Tuple
+from typing import Tuple, Union, TYPE_CHECKING
 from elyria.game_object import GameObject
 from elyria.ball_object import BallObject
 
+# numpy is only imported once a batch is checked, so that importing the
+# collision code stays cheap
+if TYPE_CHECKING:
+    import numpy as np
+
 
 # represents the four possible (collision) directions
 class Direction(Enum):
@@ -26,18 +31,22 @@ class Collision:
         self.difference = difference
 
 
+# unit vectors of the four directions, in Direction order
+COMPASS = (
+    glm.vec2( 0.0,  1.0),  # up
+    glm.vec2( 1.0,  0.0),  # right
+    glm.vec2( 0.0, -1.0),  # down
+    glm.vec2(-1.0,  0.0)   # left
+)
+
+
 def vector_direction(target: glm.vec2) -> Direction:
-    compass = [
-        glm.vec2( 0.0,  1.0),  # up
-        glm.vec2( 1.0,  0.0),  # right
-        glm.vec2( 0.0, -1.0),  # down
-        glm.vec2(-1.0,  0.0)   # left
-    ]
+    target = glm.normalize(target)
 
     fmax = 0.0
     best_match = -1
     for i in range(4):
-        dot_product = glm.dot(glm.normalize(target), compass[i])
+        dot_product = glm.dot(target, COMPASS[i])
         if dot_product > fmax:
             fmax = dot_product
             best_match = i
@@ -48,6 +57,52 @@ def vector_direction(target: glm.vec2) -> Direction:
     return Direction(best_match)
 
 
+# Circle - AABB collisions of many circles against many boxes in one pass.
+# centers: circle centers, (2,) or (n, 2); radii: scalar or (n,)
+# positions, sizes: top-left corners and sizes of the boxes, (m, 2)
+# Returns, per circle and box ((m,) for a single circle, else (n, m)): whether
+# they collide, the Direction value of the collision and the difference vector
+# from the circle center to the closest point of the box (radius minus its
+# length is the penetration). Directions and differences are 0 without a hit.
+def check_ball_collisions(
+    centers: "np.ndarray",
+    radii: Union[float, "np.ndarray"],
+    positions: "np.ndarray",
+    sizes: "np.ndarray"
+) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    import numpy as np
+
+    # float32, like glm, so that the results match check_ball_collision
+    centers = np.asarray(centers, dtype=np.float32)
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+    sizes = np.asarray(sizes, dtype=np.float32).reshape(-1, 2)
+    single = centers.ndim == 1
+    centers = centers.reshape(-1, 1, 2)
+    radii = np.asarray(radii, dtype=np.float32).reshape(-1, 1)
+
+    # closest point of every box to every circle center
+    half_extents = sizes / np.float32(2.0)
+    box_centers = positions + half_extents
+    clamped = np.clip(centers - box_centers, -half_extents, half_extents)
+    differences = box_centers + clamped - centers
+
+    # not <= since touching is where every collision resolution leaves the ball
+    hits = np.einsum("...i,...i->...", differences, differences) < radii * radii
+
+    # best matching compass direction; scaling doesn't change the best dot
+    # product, so the differences needn't be normalized. No positive dot
+    # product (a zero difference) is UP, as in vector_direction
+    dots = differences @ np.array(COMPASS, dtype=np.float32).T
+    directions = np.argmax(dots, axis=-1)
+    directions[(dots.max(axis=-1) <= 0.0) | ~hits] = Direction.UP.value
+    differences[~hits] = 0.0
+
+    if single:
+        return hits[0], directions[0], differences[0]
+    return hits, directions, differences
+
+
+# single pair version of check_ball_collisions; cheaper than a batch of one
 def check_ball_collision(one: BallObject, two: GameObject) -> Collision:
     # get center point circle first
     center = glm.vec2(one.position + one.radius)
@@ -80,6 +135,85 @@ def check_ball_collision(one: BallObject, two: GameObject) -> Collision:
         return Collision(False, Direction.UP, glm.vec2(0.0, 0.0))
 
 
+# Swept circle - AABB collisions: a circle moving by displacement against
+# many boxes. This is a ray cast from the circle center against the boxes
+# grown by the radius with rounded corners: the slabs of the grown boxes give
+# the entry time, and entries next to a corner are cast against the circle
+# around that corner instead.
+# center: circle center, (2,); displacement: its movement, (2,)
+# positions, sizes: top-left corners and sizes of the boxes, (m, 2)
+# Returns, per box, the fraction of the displacement to the first contact (inf
+# if there is none within it) and the contact normal, pointing from the box to
+# the circle. Boxes the circle overlaps from the start aren't contacts; that
+# is what check_ball_collisions resolves.
+def sweep_ball_collisions(
+    center: "np.ndarray",
+    radius: float,
+    displacement: "np.ndarray",
+    positions: "np.ndarray",
+    sizes: "np.ndarray"
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    import numpy as np
+
+    center = np.asarray(center, dtype=np.float64).reshape(2)
+    displacement = np.asarray(displacement, dtype=np.float64).reshape(2)
+    box_min = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    box_max = box_min + np.asarray(sizes, dtype=np.float64).reshape(-1, 2)
+    times = np.full(len(box_min), np.inf)
+    normals = np.zeros((len(box_min), 2))
+    if not displacement.any() or len(box_min) == 0:
+        return times, normals
+
+    # entry and exit times of the slabs of the grown boxes; an axis the circle
+    # doesn't move along is either always or never inside its slab
+    grown_min = box_min - radius
+    grown_max = box_max + radius
+    with np.errstate(divide="ignore", invalid="ignore"):
+        near = (grown_min - center) / displacement
+        far = (grown_max - center) / displacement
+    entry = np.minimum(near, far)
+    exit = np.maximum(near, far)
+    still = displacement == 0.0
+    inside = (center >= grown_min) & (center <= grown_max)
+    entry = np.where(still, np.where(inside, -np.inf, np.inf), entry)
+    exit = np.where(still, np.where(inside, np.inf, -np.inf), exit)
+
+    axis = np.argmax(entry, axis=1)
+    t = entry.max(axis=1)
+    candidate = (t <= exit.min(axis=1)) & (exit.min(axis=1) >= 0.0) & (t <= 1.0)
+
+    # entry points (or start points, already within a grown box) beside the
+    # box on both axes are in a corner region
+    point = center + displacement * np.where(candidate, np.maximum(t, 0.0), 0.0)[:, None]
+    before = point < box_min
+    after = point > box_max
+    corner_region = (before | after).all(axis=1)
+
+    # face contacts: the normal opposes the movement along the entry axis
+    face = candidate & ~corner_region & (t >= 0.0)
+    rows = np.flatnonzero(face)
+    times[rows] = t[rows]
+    normals[rows, axis[rows]] = -np.sign(displacement[axis[rows]])
+
+    # corner contacts: first intersection with the circle around the corner
+    rows = np.flatnonzero(candidate & corner_region)
+    if len(rows):
+        corner = np.where(before[rows], box_min[rows], box_max[rows])
+        offset = center - corner
+        a = displacement @ displacement
+        half_b = offset @ displacement
+        c = np.einsum("ij,ij->i", offset, offset) - radius * radius
+        discriminant = half_b * half_b - a * c
+        hit = discriminant >= 0.0
+        t = (-half_b - np.sqrt(np.where(hit, discriminant, 0.0))) / a
+        hit &= (t >= 0.0) & (t <= 1.0) & (c >= 0.0)
+        rows, corner, offset, t = rows[hit], corner[hit], offset[hit], t[hit]
+        times[rows] = t
+        normals[rows] = (offset + displacement * t[:, None]) / radius
+
+    return times, normals
+
+
 # AABB - AABB collision
 def check_collision(one: GameObject, two: GameObject) -> bool:
     collisionX = (
@@ -3,6 +3,8 @@ from glfw.GLFW import *
 from glfw import _GLFWwindow as GLFWwindow
 from pygame import mixer
 from elyria.game import Game as GameClass
+from elyria.audio_manager import AudioManager
+from elyria.gl_state import GLState
 from elyria.resource_manager import ResourceManager
 from typing import Optional
 
@@ -33,6 +35,9 @@ def framebuffer_size_callback(window: GLFWwindow, width: int, height: int) -> No
     # retina displays.
     glViewport(0, 0, width, height)
 
+    # and that the offscreen render targets follow
+    game.resize(width, height)
+
 def main(_game: GameClass) -> None:
     global game
     game = _game
@@ -46,6 +51,9 @@ def main(_game: GameClass) -> None:
 
     glfwWindowHint(GLFW_RESIZABLE, False)
 
+    # multisample the window too, as frames without post-processing effects render straight to it
+    glfwWindowHint(GLFW_SAMPLES, game.samples)
+
     # glfw window creation
     window = glfwCreateWindow(game.width, game.height, "Breakout", None, None)
     if window == None:
@@ -60,37 +68,51 @@ def main(_game: GameClass) -> None:
     # OpenGL configuration
     glViewport(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
     glEnable(GL_BLEND)
-    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+    GLState.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
     # initialize audio mixer
     mixer.init()
+    AudioManager.init()
 
     # initialize game
     game.init()
 
+    # render targets are created at the window size; match the actual framebuffer
+    game.resize(*glfwGetFramebufferSize(window))
+
     # deltatime variables
     delta_time = 0.0
-    last_frame = 0.0
+    last_frame = glfwGetTime()
+    timestep = game.timestep
 
     while not glfwWindowShouldClose(window):
         # calculate delta time
         current_frame = glfwGetTime()
         delta_time = current_frame - last_frame
         last_frame = current_frame
+        GLState.begin_frame()
+        ResourceManager.residency.begin_frame()
         glfwPollEvents()
 
-        # manage user input
-        game.process_input(delta_time)
+        # advance the simulation in fixed steps, however long the frame took
+        game.advance(delta_time)
 
-        # update game state
-        game.update(delta_time)
+        # start the sounds triggered this frame
+        AudioManager.flush()
 
-        # render
+        # render, in between the last two simulation steps
+        render_start = glfwGetTime()
         glClearColor(0.0, 0.0, 0.0, 1.0)
         glClear(GL_COLOR_BUFFER_BIT)
-        game.render()
+        game.render(timestep.alpha)
+        if game.resolution is not None:
+            # wait for the GPU, so that the render time includes its work
+            glFinish()
+        render_time = glfwGetTime() - render_start
 
         glfwSwapBuffers(window)
 
+        game.end_frame(delta_time, render_time)
+
     ResourceManager.clear()
     glfwTerminate()
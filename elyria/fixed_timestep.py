@@ -0,0 +1,51 @@
+# Schedules simulation steps of a fixed duration from variable frame times.
+# Frame time accumulates and is consumed in whole steps, so the simulation
+# advances identically whatever the display refresh rate; what is left over
+# gives the interpolation alpha between the previous and the current state.
+# After a hitch at most max_steps are run and the rest of the backlog is
+# dropped, so a slow frame can't cause ever slower frames.
+class FixedTimestep:
+    def __init__(self, rate: float = 120.0, max_steps: int = 5):
+        # duration of a simulation step, in seconds
+        self.dt = 1.0 / rate
+        self.max_steps = max_steps
+        # frame time not yet simulated, in seconds
+        self.accumulator = 0.0
+
+        # statistics: frames, simulation steps run, steps run in a frame after
+        # the first (merged into a single rendered frame) and steps dropped by
+        # the catch-up cap
+        self.frames = 0
+        self.steps = 0
+        self.merged = 0
+        self.dropped = 0
+
+    # adds the duration of a frame; returns the number of steps to run
+    def advance(self, frame_time: float) -> int:
+        self.frames += 1
+        self.accumulator += max(frame_time, 0.0)
+        steps = int(self.accumulator / self.dt)
+        if steps > self.max_steps:
+            self.dropped += steps - self.max_steps
+            # whatever the cap drops isn't simulated later either
+            self.accumulator -= (steps - self.max_steps) * self.dt
+            steps = self.max_steps
+        self.accumulator -= steps * self.dt
+
+        self.steps += steps
+        self.merged += max(steps - 1, 0)
+        return steps
+
+    # fraction of a step the simulation lags behind the frame, to interpolate with
+    @property
+    def alpha(self) -> float:
+        return min(self.accumulator / self.dt, 1.0)
+
+    # returns the frames, steps, merged steps and dropped steps so far
+    def stats(self) -> dict[str, int]:
+        return {
+            "frames": self.frames,
+            "steps": self.steps,
+            "merged": self.merged,
+            "dropped": self.dropped
+        }
@@ -0,0 +1,144 @@
+import os
+import hashlib
+import numpy as np
+from elyria.cache import cache_path
+from typing import Optional
+
+
+# pixel size glyphs are rasterized at; every text size is drawn from this one size
+SDF_SIZE = 48
+
+# distance to the glyph outline, in pixels, encoded on each side of it
+SDF_SPREAD = 6
+
+# size of the glyph atlas texture, in pixels
+ATLAS_SIZE = 1024
+
+# cache file layout: magic, header, glyph table, then the atlas pixels (row major)
+MAGIC = b"ELYSDF01"
+HEADER = np.dtype([
+    ("size", "<i4"),
+    ("spread", "<i4"),
+    ("width", "<i4"),
+    ("height", "<i4"),
+    ("used_height", "<i4"),
+    ("count", "<i4")
+])
+# <bearing x, bearing y, width, height, advance, u0, v0, u1, v1> per glyph, in SDF_SIZE pixels
+GLYPH = np.dtype([("codepoint", "<i4"), ("metrics", "<f4", (9,))])
+
+
+# returns the cache file of a font, keyed by a hash of the font file and the atlas parameters
+def font_cache_file(font: str) -> str:
+    digest = hashlib.sha1()
+    with open(font, "rb") as f:
+        digest.update(f.read())
+    digest.update(f"{MAGIC}|{SDF_SIZE}|{SDF_SPREAD}|{ATLAS_SIZE}".encode())
+    return cache_path("fonts", f"{digest.hexdigest()}.sdf")
+
+
+# computes the signed distance field of a glyph coverage bitmap. The result is
+# spread pixels larger on every side; 0.5 (128) lies on the outline, larger
+# values are inside the glyph.
+def signed_distance_field(coverage: np.ndarray, spread: int = SDF_SPREAD) -> np.ndarray:
+    inside = np.pad(coverage >= 128, spread)
+    height, width = inside.shape
+
+    # pixels with a 4-neighbour on the other side of the outline
+    padded = np.pad(inside, 1, mode="edge")
+    boundary = (
+        (padded[:-2, 1:-1] != inside) | (padded[2:, 1:-1] != inside) |
+        (padded[1:-1, :-2] != inside) | (padded[1:-1, 2:] != inside)
+    ).ravel()
+    inside = inside.ravel()
+
+    ys, xs = np.mgrid[0:height, 0:width]
+    points = np.stack((ys.ravel(), xs.ravel()), axis=1).astype(np.float32)
+    distance = np.full(height * width, spread + 1.0, dtype=np.float32)
+
+    # distance of every pixel to the closest boundary pixel on the other side,
+    # in chunks of about a million pairs
+    for targets, queries in ((inside & boundary, ~inside), (~inside & boundary, inside)):
+        targets = points[targets]
+        queries = np.flatnonzero(queries)
+        if len(targets) == 0 or len(queries) == 0:
+            continue
+        for chunk in np.array_split(queries, max(1, len(queries) * len(targets) // 1_000_000)):
+            delta = points[chunk, np.newaxis, :] - targets[np.newaxis, :, :]
+            distance[chunk] = np.sqrt((delta * delta).sum(axis=2)).min(axis=1)
+
+    signed = np.where(inside, distance - 0.5, 0.5 - distance)
+    field = np.clip(0.5 + signed / (2.0 * spread), 0.0, 1.0)
+    return (field * 255.0 + 0.5).astype(np.uint8).reshape(height, width)
+
+
+# rasterizes a character of a FreeType face set to SDF_SIZE; returns its
+# distance field and <bearing x, bearing y, advance> (covering the field), or
+# None if the face can't load it
+def rasterize_glyph(face, c: str) -> Optional[tuple[np.ndarray, tuple[int, int, int]]]:
+    import freetype
+
+    if face.load_char(c, freetype.FT_LOAD_RENDER):
+        return None
+    glyph = face.glyph
+    bitmap = glyph.bitmap
+    advance = glyph.advance.x >> 6  # bitshift by 6 to get value in pixels (1/64th times 2^6 = 64)
+
+    if bitmap.width == 0 or bitmap.rows == 0:
+        return np.zeros((0, 0), dtype=np.uint8), (glyph.bitmap_left, glyph.bitmap_top, advance)
+
+    coverage = np.array(bitmap.buffer, dtype=np.uint8).reshape(bitmap.rows, bitmap.pitch)[:, :bitmap.width]
+    return (
+        signed_distance_field(coverage),
+        (glyph.bitmap_left - SDF_SPREAD, glyph.bitmap_top + SDF_SPREAD, advance)
+    )
+
+
+# writes a font atlas and its glyph table to a cache file
+def write_font_cache(
+    file: str,
+    codepoints: list[int],
+    metrics: np.ndarray,
+    pixels: np.ndarray,
+    used_height: int
+) -> None:
+    header = np.array(
+        [(SDF_SIZE, SDF_SPREAD, pixels.shape[1], pixels.shape[0], used_height, len(codepoints))],
+        dtype=HEADER
+    )
+    glyphs = np.zeros(len(codepoints), dtype=GLYPH)
+    glyphs["codepoint"] = codepoints
+    glyphs["metrics"] = metrics
+
+    # write next to the final file first, so an interrupted write is never picked up
+    with open(file + ".tmp", "wb") as f:
+        f.write(MAGIC)
+        f.write(header.tobytes())
+        f.write(glyphs.tobytes())
+        f.write(np.ascontiguousarray(pixels).tobytes())
+    os.replace(file + ".tmp", file)
+
+
+# memory-maps a font cache file; returns (codepoints, metrics, pixels, used
+# height) or None if there is no usable cache file
+def read_font_cache(file: str) -> Optional[tuple[np.ndarray, np.ndarray, np.ndarray, int]]:
+    if not os.path.exists(file):
+        return None
+    try:
+        data = np.memmap(file, dtype=np.uint8, mode="r")
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            return None
+        offset = len(MAGIC)
+        header = data[offset:offset + HEADER.itemsize].view(HEADER)[0]
+        offset += HEADER.itemsize
+        if header["size"] != SDF_SIZE or header["spread"] != SDF_SPREAD:
+            return None
+
+        glyphs = data[offset:offset + int(header["count"]) * GLYPH.itemsize].view(GLYPH)
+        offset += glyphs.nbytes
+        pixels = data[offset:offset + int(header["width"]) * int(header["height"])]
+        pixels = pixels.reshape(int(header["height"]), int(header["width"]))
+        return glyphs["codepoint"], glyphs["metrics"], pixels, int(header["used_height"])
+    except Exception as e:
+        print(f"ERROR::FONT: Failed to read font cache {file}\n{e}")
+        return None
@@ -1,18 +1,25 @@
 import os
 import glm
 import random
-from glfw.GLFW import *
 from enum import StrEnum
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 from elyria import base_dir
-from elyria.sprite_renderer import SpriteRenderer
-from elyria.resource_manager import ResourceManager
+from elyria.keys import *
+from elyria.audio_manager import AudioManager
 from elyria.game_object import GameObject
 from elyria.ball_object import BallObject
-from elyria.collision import check_ball_collision, Direction, check_collision
-from elyria.particle import ParticleGenerator
-from elyria.post_processor import PostProcessor
-from elyria.text_renderer import TextRenderer
+from elyria.collision import check_ball_collision, check_ball_collisions, sweep_ball_collisions, vector_direction, Direction, check_collision
+from elyria.fixed_timestep import FixedTimestep
+from elyria.resolution_controller import ResolutionController
+
+# the graphics backends are imported once they are set up (init_graphics), so
+# that game logic can be imported and run headless without OpenGL
+if TYPE_CHECKING:
+    from elyria.sprite_renderer import SpriteRenderer
+    from elyria.particle import ParticleGenerator
+    from elyria.post_processor import PostProcessor
+    from elyria.text_renderer import TextRenderer
+    from elyria.texture2d import Texture2D
 
 
 class Game:
@@ -22,42 +29,133 @@ class Game:
         self.width = width
         self.height = height
 
-        self.renderer: Optional[SpriteRenderer] = None
+        self.renderer: Optional["SpriteRenderer"] = None
         self.player: Optional[GameObject] = None
         self.ball: Optional[BallObject] = None
-        self.particles: Optional[ParticleGenerator] = None
-        self.effects: Optional[PostProcessor] = None
-        self.text: Optional[TextRenderer] = None
+        self.particles: Optional["ParticleGenerator"] = None
+        self.effects: Optional["PostProcessor"] = None
+        self.text: Optional["TextRenderer"] = None
+
+        # offscreen rendering: size relative to the window and MSAA samples (0 disables it)
+        self.render_scale = 1.0
+        self.samples = 4
+        # when set, adapts the render scale to hold its target frame rate
+        self.resolution: Optional[ResolutionController] = None
+        # game time, advanced by end_frame
+        self.time = 0.0
+        # process_input and update run in fixed steps of this scheduler
+        self.timestep = FixedTimestep(rate=120.0, max_steps=5)
 
     def init(self) -> None:
         # initialize game state (load all shaders/textures/levels)
-        
+        self.init_graphics()
+
+    # loads the shaders and creates the renderer, post-processing effects and text renderer
+    def init_graphics(self) -> None:
+        from elyria.resource_manager import ResourceManager
+        from elyria.sprite_renderer import SpriteRenderer
+        from elyria.post_processor import PostProcessor
+        from elyria.text_renderer import TextRenderer
+
         # load shaders
         ResourceManager.load_shader("sprite", os.path.join(base_dir, "shaders", "sprite.vs"), os.path.join(base_dir, "shaders", "sprite.fs"))
+        ResourceManager.load_shader("sprite_instanced", os.path.join(base_dir, "shaders", "sprite_instanced.vs"), os.path.join(base_dir, "shaders", "sprite_instanced.fs"))
         ResourceManager.load_shader("particle", os.path.join(base_dir, "shaders", "particle.vs"), os.path.join(base_dir, "shaders", "particle.fs"))
+        ResourceManager.load_shader("particle_gpu", os.path.join(base_dir, "shaders", "particle_gpu.vs"), os.path.join(base_dir, "shaders", "particle.fs"))
         ResourceManager.load_shader("postprocessing", os.path.join(base_dir, "shaders", "post_processing.vs"), os.path.join(base_dir, "shaders", "post_processing.fs"))
 
         # configure shaders
         projection = glm.ortho(0.0, float(self.width), float(self.height), 0.0, -1.0, 1.0)
+        matrices = ResourceManager.load_uniform_buffer("Matrices", glm.sizeof(glm.mat4), 0)
+        matrices.set_mat4(0, projection)
+        matrices.attach(ResourceManager.get_shader("sprite"))
+        matrices.attach(ResourceManager.get_shader("sprite_instanced"))
+        matrices.attach(ResourceManager.get_shader("particle"))
+        matrices.attach(ResourceManager.get_shader("particle_gpu"))
         ResourceManager.get_shader("sprite").use()
         ResourceManager.get_shader("sprite").set_int("image", 0)
-        ResourceManager.get_shader("sprite").set_mat4("projection", projection)
+        ResourceManager.get_shader("sprite_instanced").use()
+        ResourceManager.get_shader("sprite_instanced").set_int("image", 0)
         ResourceManager.get_shader("particle").use()
         ResourceManager.get_shader("particle").set_int("sprite", 0)
-        ResourceManager.get_shader("particle").set_mat4("projection", projection)
+        ResourceManager.get_shader("particle_gpu").use()
+        ResourceManager.get_shader("particle_gpu").set_int("sprite", 0)
 
         # set render-specific controls
-        self.renderer = SpriteRenderer(ResourceManager.get_shader("sprite"))
-        self.effects = PostProcessor(ResourceManager.get_shader("postprocessing"), self.width, self.height)
+        self.renderer = SpriteRenderer(ResourceManager.get_shader("sprite"), ResourceManager.get_shader("sprite_instanced"))
+        self.effects = PostProcessor(
+            ResourceManager.get_shader("postprocessing"),
+            self.width,
+            self.height,
+            render_scale=self.resolution.render_scale if self.resolution else self.render_scale,
+            samples=self.samples
+        )
         self.text = TextRenderer(self.width, self.height)
         self.text.load("fonts/ocraext.ttf", 24)
 
+    # loads the textures and sounds of the game
+    def load_assets(self) -> None:
+        pass
+
+    def create_particles(self, texture: Optional["Texture2D"], amount: int) -> "ParticleGenerator":
+        from elyria.particle import ParticleGenerator
+
+        return ParticleGenerator(texture, amount)
+
+    # returns a texture loaded in the ResourceManager (None if there is none)
+    def texture(self, name: str) -> Optional["Texture2D"]:
+        from elyria.resource_manager import ResourceManager
+
+        return ResourceManager.get_texture(name)
+
+    # triggers a sound effect loaded with ResourceManager.load_music
+    def play_sound(self, name: str) -> None:
+        AudioManager.play(name)
+
+    # runs the fixed simulation steps a frame of the given duration amounts to
+    # (see FixedTimestep); returns how many were run
+    def advance(self, frame_time: float) -> int:
+        steps = self.timestep.advance(frame_time)
+        for _ in range(steps):
+            self.save_state()
+
+            # manage user input
+            self.process_input(self.timestep.dt)
+
+            # update game state
+            self.update(self.timestep.dt)
+        return steps
+
     def process_input(self, dt: float) -> None:
         pass
 
     def update(self, dt: float) -> None:
         pass
 
-    def render(self) -> None:
+    # remembers the state of the moving objects before a simulation step, so
+    # that render can interpolate from it
+    def save_state(self) -> None:
+        if self.player is not None:
+            self.player.save_state()
+        if self.ball is not None:
+            self.ball.save_state()
+
+    # alpha: fraction of the way from the previous to the current simulation step
+    def render(self, alpha: float = 1.0) -> None:
         pass
+
+    # called after every frame with its duration and the time spent rendering
+    # it (without waiting for vsync), which the resolution controller adapts to
+    def end_frame(self, dt: float, render_time: Optional[float] = None) -> None:
+        self.time += dt
+        if self.resolution is not None and self.effects is not None:
+            render_scale = self.resolution.update(dt, render_time)
+            if render_scale is not None:
+                self.render_scale = render_scale
+                self.effects.set_render_scale(render_scale)
+
+    # called when the window framebuffer is resized
+    def resize(self, width: int, height: int) -> None:
+        if self.effects is not None:
+            self.effects.resize(width, height)
     
\ No newline at end of file
@@ -1,7 +1,10 @@
 import glm
-from elyria.texture2d import Texture2D
-from elyria.sprite_renderer import SpriteRenderer
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
+
+# only needed for annotations; importing them would pull in OpenGL
+if TYPE_CHECKING:
+    from elyria.texture2d import Texture2D
+    from elyria.sprite_renderer import SpriteRenderer
 
 
 # Container object for holding all state relevant for a single
@@ -13,7 +16,7 @@ class GameObject:
         position: glm.vec2 = glm.vec2(0.0, 0.0),
         rotation: float = 0.0,
         size: glm.vec2 = glm.vec2(1.0, 1.0),
-        texture: Optional[Texture2D] = None,
+        texture: Optional["Texture2D"] = None,
         color: glm.vec3 = glm.vec3(1.0),
         velocity: glm.vec2 = glm.vec2(0.0, 0.0),
         is_solid: bool = False,
@@ -27,11 +30,18 @@ class GameObject:
         self.velocity = velocity
         self.is_solid = is_solid
         self.destroyed = destroyed
+        # position at the previous simulation step, to interpolate from
+        self.previous_position = glm.vec2(position)
+
+    # remembers the current position before a simulation step
+    def save_state(self) -> None:
+        self.previous_position = glm.vec2(self.position)
 
-    def draw(self, renderer: SpriteRenderer) -> None:
+    # draws the object alpha of the way from its previous to its current position
+    def draw(self, renderer: "SpriteRenderer", alpha: float = 1.0) -> None:
         renderer.draw_sprite(
             self.texture,
-            self.position,
+            glm.mix(self.previous_position, self.position, alpha) if alpha < 1.0 else self.position,
             self.size,
             self.rotation,
             self.color
@@ -0,0 +1,165 @@
+from OpenGL.GL import *
+from typing import Optional
+
+
+# Caches the OpenGL binding state shared by all renderers, so that binding an
+# object that is already bound never reaches the driver. Every renderer changes
+# program, texture, vertex array, buffer, framebuffer and blend state through
+# here; a state that is unknown (None) is always forwarded to OpenGL.
+class GLState:
+    # cached state
+    program: Optional[int] = None
+    texture_unit: Optional[int] = None
+    textures: dict[int, int] = {}  # texture unit -> bound 2D texture
+    vertex_array: Optional[int] = None
+    buffers: dict[int, int] = {}  # buffer target -> bound buffer
+    read_framebuffer: Optional[int] = None
+    draw_framebuffer: Optional[int] = None
+    blend: Optional[tuple[int, int]] = None
+
+    # number of state calls forwarded to OpenGL and avoided, for the current frame
+    issued: int = 0
+    skipped: int = 0
+
+    # same counters for the last completed frame
+    last_frame_issued: int = 0
+    last_frame_skipped: int = 0
+
+    # starts counting calls for a new frame
+    @staticmethod
+    def begin_frame() -> None:
+        GLState.last_frame_issued = GLState.issued
+        GLState.last_frame_skipped = GLState.skipped
+        GLState.issued = 0
+        GLState.skipped = 0
+
+    # returns the (issued, avoided) call counts of the last completed frame
+    @staticmethod
+    def frame_stats() -> tuple[int, int]:
+        return GLState.last_frame_issued, GLState.last_frame_skipped
+
+    # forgets all cached state, e.g. after OpenGL state was changed behind our back
+    @staticmethod
+    def reset() -> None:
+        GLState.program = None
+        GLState.texture_unit = None
+        GLState.textures.clear()
+        GLState.vertex_array = None
+        GLState.buffers.clear()
+        GLState.read_framebuffer = None
+        GLState.draw_framebuffer = None
+        GLState.blend = None
+
+    @staticmethod
+    def use_program(program: int) -> None:
+        if GLState.program == program:
+            GLState.skipped += 1
+            return
+        glUseProgram(program)
+        GLState.program = program
+        GLState.issued += 1
+
+    @staticmethod
+    def active_texture(unit: int) -> None:
+        if GLState.texture_unit == unit:
+            GLState.skipped += 1
+            return
+        glActiveTexture(unit)
+        GLState.texture_unit = unit
+        GLState.issued += 1
+
+    # binds a 2D texture to the active texture unit
+    @staticmethod
+    def bind_texture(texture: int) -> None:
+        # the active unit is unknown until active_texture was called once
+        if GLState.texture_unit is not None and GLState.textures.get(GLState.texture_unit) == texture:
+            GLState.skipped += 1
+            return
+        glBindTexture(GL_TEXTURE_2D, texture)
+        if GLState.texture_unit is not None:
+            GLState.textures[GLState.texture_unit] = texture
+        GLState.issued += 1
+
+    @staticmethod
+    def bind_vertex_array(vertex_array: int) -> None:
+        if GLState.vertex_array == vertex_array:
+            GLState.skipped += 1
+            return
+        glBindVertexArray(vertex_array)
+        GLState.vertex_array = vertex_array
+        GLState.issued += 1
+
+    @staticmethod
+    def bind_buffer(target: int, buffer: int) -> None:
+        if GLState.buffers.get(target) == buffer:
+            GLState.skipped += 1
+            return
+        glBindBuffer(target, buffer)
+        GLState.buffers[target] = buffer
+        GLState.issued += 1
+
+    # binds a buffer to an indexed binding point; this also changes the generic binding of target
+    @staticmethod
+    def bind_buffer_base(target: int, index: int, buffer: int) -> None:
+        glBindBufferBase(target, index, buffer)
+        GLState.buffers[target] = buffer
+        GLState.issued += 1
+
+    @staticmethod
+    def bind_framebuffer(target: int, framebuffer: int) -> None:
+        if target == GL_FRAMEBUFFER:
+            if GLState.read_framebuffer == framebuffer and GLState.draw_framebuffer == framebuffer:
+                GLState.skipped += 1
+                return
+            GLState.read_framebuffer = framebuffer
+            GLState.draw_framebuffer = framebuffer
+        elif target == GL_READ_FRAMEBUFFER:
+            if GLState.read_framebuffer == framebuffer:
+                GLState.skipped += 1
+                return
+            GLState.read_framebuffer = framebuffer
+        else:
+            if GLState.draw_framebuffer == framebuffer:
+                GLState.skipped += 1
+                return
+            GLState.draw_framebuffer = framebuffer
+        glBindFramebuffer(target, framebuffer)
+        GLState.issued += 1
+
+    @staticmethod
+    def blend_func(sfactor: int, dfactor: int) -> None:
+        if GLState.blend == (sfactor, dfactor):
+            GLState.skipped += 1
+            return
+        glBlendFunc(sfactor, dfactor)
+        GLState.blend = (sfactor, dfactor)
+        GLState.issued += 1
+
+    # deleting an object makes OpenGL unbind it (and its name may be reused), so
+    # the deletions below also drop it from the cache
+
+    @staticmethod
+    def delete_program(program: int) -> None:
+        glDeleteProgram(program)
+        if GLState.program == program:
+            GLState.program = None
+
+    @staticmethod
+    def delete_texture(texture: int) -> None:
+        glDeleteTextures(1, [texture])
+        for unit, bound in list(GLState.textures.items()):
+            if bound == texture:
+                del GLState.textures[unit]
+
+    @staticmethod
+    def delete_vertex_array(vertex_array: int) -> None:
+        glDeleteVertexArrays(1, [vertex_array])
+        if GLState.vertex_array == vertex_array:
+            GLState.vertex_array = None
+
+    @staticmethod
+    def delete_buffer(buffer: int) -> None:
+        glDeleteBuffers(1, [buffer])
+        for target, bound in list(GLState.buffers.items()):
+            if bound == buffer:
+                del GLState.buffers[target]
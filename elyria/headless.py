@@ -0,0 +1,132 @@
+import time
+import glm
+from elyria.game import Game
+from elyria.game_object import GameObject
+from typing import Callable, Optional
+
+
+# Sprite renderer that draws nothing
+class NullRenderer:
+    def __init__(self) -> None:
+        # no instanced path: levels draw their bricks one by one (for nothing)
+        self.instanced_shader = None
+        self.batching = False
+
+    def draw_sprite(self, texture, position, size=None, rotate=0.0, color=None) -> None:
+        pass
+
+    def begin(self) -> None:
+        pass
+
+    def submit(self, texture, position, size=None, rotate=0.0, color=None) -> None:
+        pass
+
+    def draw_static(self, batch) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+
+# Post-processor that only keeps track of the effect flags
+class NullEffects:
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.render_scale = 1.0
+        self.confuse = False
+        self.chaos = False
+        self.shake = False
+
+    def begin_render(self) -> None:
+        pass
+
+    def end_render(self) -> None:
+        pass
+
+    def render(self, time: float) -> None:
+        pass
+
+    def resize(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+
+    def set_render_scale(self, render_scale: float) -> None:
+        self.render_scale = render_scale
+
+
+# Text renderer that draws nothing
+class NullText:
+    def load(self, font: str, font_size: int) -> None:
+        pass
+
+    def render_text(self, text: str, x: float, y: float, scale: float, color: glm.vec3 = glm.vec3(1.0)) -> None:
+        pass
+
+
+# Particle generator that simulates nothing
+class NullParticles:
+    def update(self, dt: float, go: GameObject, new_particles: int, offset: glm.vec2 = glm.vec2(0.0, 0.0)) -> None:
+        pass
+
+    def draw(self) -> None:
+        pass
+
+
+# Mixin replacing the graphics, audio and effects backends of a Game with null
+# ones, so that its logic runs without a window, GL context or audio device.
+# Textures and sounds aren't loaded; game objects simply have no texture.
+class HeadlessGame:
+    def init_graphics(self) -> None:
+        self.renderer = NullRenderer()
+        self.effects = NullEffects(self.width, self.height)
+        self.text = NullText()
+
+    def load_assets(self) -> None:
+        pass
+
+    def create_particles(self, texture, amount: int) -> NullParticles:
+        return NullParticles()
+
+    def texture(self, name: str) -> None:
+        return None
+
+    def play_sound(self, name: str) -> None:
+        self.sounds_played = getattr(self, "sounds_played", 0) + 1
+
+
+# returns a headless version of a Game subclass
+def headless(game_class: type[Game]) -> type[Game]:
+    return type(f"Headless{game_class.__name__}", (HeadlessGame, game_class), {})
+
+
+# Runs a headless game for the given simulated time, in frames of duration dt.
+# Every frame goes through Game.advance, so the simulation runs in the same
+# fixed steps (game.timestep) as in real play. Before every frame, input (if
+# given) is called with the game and the frame number to press or release keys
+# in game.keys. Returns the simulated frames, the wall clock time, the
+# simulated frames per second and the timestep statistics.
+def run(
+    game: Game,
+    seconds: float,
+    dt: float = 1.0 / 60.0,
+    input: Optional[Callable[[Game, int], None]] = None,
+    render: bool = True
+) -> dict[str, float]:
+    frames = int(seconds / dt)
+    start = time.perf_counter()
+    for frame in range(frames):
+        if input is not None:
+            input(game, frame)
+        game.advance(dt)
+        if render:
+            game.render(game.timestep.alpha)
+        game.end_frame(dt)
+    elapsed = time.perf_counter() - start
+
+    return {
+        **game.timestep.stats(),
+        "frames": frames,
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed > 0.0 else float("inf")
+    }
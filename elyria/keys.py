@@ -0,0 +1,62 @@
+# Key codes of glfw (GLFW_KEY_*), as found in Game.keys. They are defined here
+# so that game logic can check keys without importing glfw, e.g. when it runs
+# headless.
+
+GLFW_KEY_SPACE = 32
+GLFW_KEY_APOSTROPHE = 39
+GLFW_KEY_COMMA = 44
+GLFW_KEY_MINUS = 45
+GLFW_KEY_PERIOD = 46
+GLFW_KEY_SLASH = 47
+GLFW_KEY_0 = 48
+GLFW_KEY_1 = 49
+GLFW_KEY_2 = 50
+GLFW_KEY_3 = 51
+GLFW_KEY_4 = 52
+GLFW_KEY_5 = 53
+GLFW_KEY_6 = 54
+GLFW_KEY_7 = 55
+GLFW_KEY_8 = 56
+GLFW_KEY_9 = 57
+GLFW_KEY_SEMICOLON = 59
+GLFW_KEY_EQUAL = 61
+GLFW_KEY_A = 65
+GLFW_KEY_B = 66
+GLFW_KEY_C = 67
+GLFW_KEY_D = 68
+GLFW_KEY_E = 69
+GLFW_KEY_F = 70
+GLFW_KEY_G = 71
+GLFW_KEY_H = 72
+GLFW_KEY_I = 73
+GLFW_KEY_J = 74
+GLFW_KEY_K = 75
+GLFW_KEY_L = 76
+GLFW_KEY_M = 77
+GLFW_KEY_N = 78
+GLFW_KEY_O = 79
+GLFW_KEY_P = 80
+GLFW_KEY_Q = 81
+GLFW_KEY_R = 82
+GLFW_KEY_S = 83
+GLFW_KEY_T = 84
+GLFW_KEY_U = 85
+GLFW_KEY_V = 86
+GLFW_KEY_W = 87
+GLFW_KEY_X = 88
+GLFW_KEY_Y = 89
+GLFW_KEY_Z = 90
+GLFW_KEY_ESCAPE = 256
+GLFW_KEY_ENTER = 257
+GLFW_KEY_TAB = 258
+GLFW_KEY_BACKSPACE = 259
+GLFW_KEY_RIGHT = 262
+GLFW_KEY_LEFT = 263
+GLFW_KEY_DOWN = 264
+GLFW_KEY_UP = 265
+GLFW_KEY_LEFT_SHIFT = 340
+GLFW_KEY_LEFT_CONTROL = 341
+GLFW_KEY_LEFT_ALT = 342
+GLFW_KEY_RIGHT_SHIFT = 344
+GLFW_KEY_RIGHT_CONTROL = 345
+GLFW_KEY_RIGHT_ALT = 346
@@ -0,0 +1,91 @@
+import os
+import time
+import threading
+from pygame import mixer
+from elyria.audio_cache import frame_size, load_pcm, store_pcm
+from typing import Optional
+
+
+# length of the PCM chunks queued on the mixer, in seconds
+CHUNK_SECONDS = 0.5
+
+# tracks whose file is larger than this aren't cached: decoding them whole in
+# the background would take too much memory. They keep playing through mixer.music
+MAX_CACHED_FILE_SIZE = 16 * 1024 * 1024
+
+
+# Plays a long music track without decoding it into memory up front. Once its
+# PCM is cached, a background thread queues it on a mixer channel one chunk at
+# a time, straight from the memory-mapped cache file. Until then the track is
+# played by mixer.music, which streams from the file itself, while the PCM
+# cache is built in the background for the next run.
+class MusicStream:
+    def __init__(self, file: str):
+        self.file = file
+        self.channel: Optional[mixer.Channel] = None
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+        # whether mixer.music plays the track (no PCM cache yet)
+        self.fallback = False
+
+    def play(self, loop: bool = False) -> None:
+        self.stop()
+        pcm = load_pcm(self.file)
+        if pcm is None:
+            try:
+                mixer.music.load(self.file)
+                mixer.music.play(-1 if loop else 0)
+            except Exception as e:
+                print(f"ERROR::AUDIO: Failed to play {self.file}\n{e}")
+                return
+            self.fallback = True
+            threading.Thread(target=self.cache, daemon=True).start()
+            return
+
+        self.channel = mixer.find_channel(True)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, args=(pcm, loop), daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.fallback:
+            mixer.music.stop()
+            self.fallback = False
+        if self.thread is not None:
+            self.running = False
+            self.thread.join()
+            self.thread = None
+        if self.channel is not None:
+            self.channel.stop()
+            self.channel = None
+
+    # queues the next chunk whenever the channel's queue is empty
+    def run(self, pcm, loop: bool) -> None:
+        chunk = int(mixer.get_init()[0] * CHUNK_SECONDS) * frame_size()
+        position = 0
+        while self.running:
+            if position >= len(pcm):
+                if not loop:
+                    break
+                position = 0
+            if self.channel.get_queue() is None:
+                sound = mixer.Sound(buffer=pcm[position:position + chunk])
+                if self.channel.get_busy():
+                    self.channel.queue(sound)
+                else:
+                    self.channel.play(sound)
+                position += chunk
+            else:
+                time.sleep(CHUNK_SECONDS / 4)
+
+    # decodes the track once and stores its PCM for the next runs. The decoded
+    # samples are written straight from the sound's buffer, so the track is
+    # only held in memory once, and only while it's cached
+    def cache(self) -> None:
+        try:
+            if os.path.getsize(self.file) > MAX_CACHED_FILE_SIZE:
+                return
+            sound = mixer.Sound(self.file)
+            store_pcm(self.file, sound.get_view())
+        except Exception as e:
+            print(f"ERROR::AUDIO: Failed to decode {self.file}\n{e}")
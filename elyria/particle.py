@@ -1,42 +1,70 @@
 import glm
 import numpy as np
-import random
+from enum import StrEnum
 from OpenGL.GL import *
+from elyria.gl_state import GLState
 from elyria.shader import Shader
 from elyria.texture2d import Texture2D
 from elyria.game_object import GameObject
 from elyria.resource_manager import ResourceManager
 
 
-# Represents a single particle and its state
-class Particle:
-    def __init__(
-        self,
-        position: glm.vec2 = glm.vec2(0.0),
-        velocity: glm.vec2 = glm.vec2(0.0),
-        color: glm.vec4 = glm.vec4(1.0),
-        life: float = 0.0
-    ):
-        self.position = position
-        self.velocity = velocity
-        self.color = color
-        self.life = life
+# life of a particle, in seconds
+PARTICLE_LIFE = 1.0
+
+# alpha a particle loses per second
+PARTICLE_FADE = 2.5
 
 
-# ParticleGenerator acts as a container for rendering a large number of
+# where particles are simulated
+class ParticleMode(StrEnum):
+    # updated on the CPU every frame and re-uploaded
+    CPU = "cpu"
+    # only spawn records are uploaded; the vertex shader evaluates the closed-form
+    # motion of every particle from its spawn time
+    GPU = "gpu"
+
+
+# ParticleGenerator acts as a container for rendering a large number of
 # particles by repeatedly spawing and updating particles and killing
 # them after a given amount of time.
+# Particles are stored as a struct of arrays: one contiguous float32 array
+# per attribute, updated with vectorized operations.
 class ParticleGenerator:
-    def __init__(self, texture: Texture2D, amount: int, shader: Shader = None):
-        self.shader = shader if shader else ResourceManager.get_shader("particle")
+    def __init__(
+        self,
+        texture: Texture2D,
+        amount: int,
+        shader: Shader = None,
+        mode: ParticleMode = ParticleMode.CPU
+    ):
+        self.mode = mode
+        if shader:
+            self.shader = shader
+        elif mode == ParticleMode.GPU:
+            self.shader = ResourceManager.get_shader("particle_gpu")
+        else:
+            self.shader = ResourceManager.get_shader("particle")
         self.texture = texture
         self.amount = amount
 
-        self.particles: list[Particle] = []
+        # simulation clock, drives the GPU mode
+        self.time = 0.0
+
+        # <vec2 position, vec4 color> of every particle, laid out exactly as the
+        # per-instance attributes uploaded to the GPU; position and color are views
+        self.instances = np.zeros((amount, 6), dtype=np.float32)
+        self.position = self.instances[:, 0:2]
+        self.color = self.instances[:, 2:6]
+        self.velocity = np.zeros((amount, 2), dtype=np.float32)
+        self.life = np.zeros(amount, dtype=np.float32)
+        self.alive = np.zeros(amount, dtype=bool)
 
-        # stores the index of the last particle used
-        # (for quick access to next dead particle)
-        self.last_used_particle = 0
+        # stack of dead particle indices (the top is free[free_count - 1])
+        self.free = np.arange(amount - 1, -1, -1, dtype=np.int64)
+        self.free_count = amount
+
+        self.rng = np.random.default_rng()
 
         # initializes buffer and vertex attributes
 
@@ -52,78 +80,169 @@ class ParticleGenerator:
         ], dtype=np.float32)
         self.vao = glGenVertexArrays(1)
         vbo = glGenBuffers(1)
-        glBindVertexArray(self.vao)
+        GLState.bind_vertex_array(self.vao)
 
         # fill mesh buffer
-        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, vbo)
         glBufferData(GL_ARRAY_BUFFER, particle_quad.nbytes, particle_quad, GL_STATIC_DRAW)
 
         # set mesh attributes
         glEnableVertexAttribArray(0)
         glVertexAttribPointer(0, 4, GL_FLOAT, GL_FALSE, 4 * glm.sizeof(glm.float32), ctypes.c_void_p(0))
-        glBindVertexArray(0)
 
-        # create self.amount default particle instances
-        for i in range(self.amount):
-            self.particles.append(Particle())
+        self.instance_vbo = glGenBuffers(1)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        if mode == ParticleMode.GPU:
+            self.init_spawn_records()
+        else:
+            # per-instance attributes, re-uploaded every frame: <vec2 offset> <vec4 color>
+            glBufferData(GL_ARRAY_BUFFER, 0, None, GL_STREAM_DRAW)
+            glEnableVertexAttribArray(1)
+            glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 6 * glm.sizeof(glm.float32), ctypes.c_void_p(0))
+            glVertexAttribDivisor(1, 1)
+            glEnableVertexAttribArray(2)
+            glVertexAttribPointer(2, 4, GL_FLOAT, GL_FALSE, 6 * glm.sizeof(glm.float32), ctypes.c_void_p(2 * glm.sizeof(glm.float32)))
+            glVertexAttribDivisor(2, 1)
+        GLState.bind_vertex_array(0)
+
+    # sets up the ring buffer of spawn records used by the GPU mode:
+    # <vec2 emitter position, vec2 velocity> <float spawn time, float seed>
+    def init_spawn_records(self) -> None:
+        self.records = np.zeros((self.amount, 6), dtype=np.float32)
+        # never spawned: far enough in the past to be dead
+        self.records[:, 4] = -1.0e9
+        # next record to overwrite
+        self.head = 0
+
+        glBufferData(GL_ARRAY_BUFFER, self.records.nbytes, self.records, GL_DYNAMIC_DRAW)
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(1, 4, GL_FLOAT, GL_FALSE, 6 * glm.sizeof(glm.float32), ctypes.c_void_p(0))
+        glVertexAttribDivisor(1, 1)
+        glEnableVertexAttribArray(2)
+        glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, 6 * glm.sizeof(glm.float32), ctypes.c_void_p(4 * glm.sizeof(glm.float32)))
+        glVertexAttribDivisor(2, 1)
 
     # update all particles
     def update(self, dt: float, go: GameObject, new_particles: int, offset: glm.vec2 = glm.vec2(0.0, 0.0)) -> None:
+        if self.mode == ParticleMode.GPU:
+            # only new particles are recorded, their motion is evaluated on the GPU
+            if new_particles > 0:
+                self.record_spawns(new_particles, go, offset)
+            self.time += dt
+            return
+
         # add new particles
-        for i in range(new_particles):
-            unused_particle = self.first_unused_particle()
-            self.respawn_particle(self.particles[unused_particle], go, offset)
+        if new_particles > 0:
+            self.respawn_particles(self.unused_particles(new_particles), go, offset)
 
         # update all particles
-        for p in self.particles:
-            p.life -= dt  # reduce life
-            if p.life > 0.0:
-                # particle is alive, thus update
-                p.position -= p.velocity * dt
-                p.color.w -= dt * 2.5
-
-    # render all particles
+        self.life -= dt  # reduce life
+        alive = self.life > 0.0
+
+        # particles that are alive, thus update
+        self.position[alive] -= self.velocity[alive] * dt
+        self.color[alive, 3] -= dt * PARTICLE_FADE
+
+        # particles that just died become available again
+        died = np.flatnonzero(self.alive & ~alive)
+        self.free[self.free_count:self.free_count + len(died)] = died
+        self.free_count += len(died)
+        self.alive = alive
+        self.time += dt
+
+    # writes count spawn records at the head of the ring buffer, overwriting the
+    # oldest particles, and uploads only the records that changed
+    def record_spawns(self, count: int, go: GameObject, offset: glm.vec2 = glm.vec2(0.0, 0.0)) -> None:
+        count = min(count, self.amount)
+        indices = (self.head + np.arange(count)) % self.amount
+        self.head = (self.head + count) % self.amount
+
+        self.records[indices, 0] = go.position.x + offset.x
+        self.records[indices, 1] = go.position.y + offset.y
+        self.records[indices, 2] = go.velocity.x * 0.1
+        self.records[indices, 3] = go.velocity.y * 0.1
+        self.records[indices, 4] = self.time
+        self.records[indices, 5] = self.rng.random(count, dtype=np.float32)
+
+        # upload the written range, in two parts when it wraps around
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        first = int(indices[0])
+        for start, end in ((first, min(first + count, self.amount)), (0, max(first + count - self.amount, 0))):
+            if end > start:
+                glBufferSubData(
+                    GL_ARRAY_BUFFER,
+                    start * self.records.strides[0],
+                    (end - start) * self.records.strides[0],
+                    self.records[start:end]
+                )
+
+    # render all particles with a single instanced draw
     def draw(self) -> None:
+        if self.mode == ParticleMode.GPU:
+            self.draw_gpu()
+            return
+
+        instances = self.instances[self.alive]
+        if len(instances) == 0:
+            return
+
         # use additive blending to give it a 'glow' effect
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE)
+        GLState.blend_func(GL_SRC_ALPHA, GL_ONE)
         self.shader.use()
+        self.shader.set_vec4("uvRect", self.texture.uv_rect)
+        GLState.active_texture(GL_TEXTURE0)
+        self.texture.bind()
 
-        for particle in self.particles:
-            if particle.life > 0.0:
-                self.shader.set_vec2("offset", particle.position)
-                self.shader.set_vec4("color", particle.color)
-                self.texture.bind()
-                glBindVertexArray(self.vao)
-                glDrawArrays(GL_TRIANGLES, 0, 6)
-                glBindVertexArray(0)
+        GLState.bind_vertex_array(self.vao)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        glBufferData(GL_ARRAY_BUFFER, instances.nbytes, instances, GL_STREAM_DRAW)
+        glDrawArraysInstanced(GL_TRIANGLES, 0, 6, len(instances))
 
         # don't forget to reset to default blending mode
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-
-    # returns the first Particle index that's currently unused e.g. 
-    # Life <= 0.0f or 0 if no particle is currently inactive
-    def first_unused_particle(self) -> int:
-        # first search from last used particle, this will usually return almost instantly
-        for i in range(self.last_used_particle, self.amount):
-            if self.particles[i].life <= 0.0:
-                self.last_used_particle = i
-                return i
-            
-        # otherwise, do a linear search
-        for i in range(self.last_used_particle):
-            if self.particles[i].life <= 0.0:
-                self.last_used_particle = i
-                return i
-            
-        # all particles are taken, override the first one (note that if it
-        # repeatedly hits this case, more particles should be reserved)
-        self.last_used_particle = 0
-        return 0
-
-    def respawn_particle(self, particle: Particle, go: GameObject, offset: glm.vec2 = glm.vec2(0.0, 0.0)) -> None:
-        rnd = (random.randint(0, 99) - 50) / 10.0
-        r_color = 0.5 + (random.randint(0, 99) / 100.0)
-        particle.position = go.position + rnd + offset
-        particle.color = glm.vec4(r_color, r_color, r_color, 1.0)
-        particle.life = 1.0
-        particle.velocity = go.velocity * 0.1
+        GLState.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+    # draws every record of the ring buffer; the vertex shader discards dead ones
+    def draw_gpu(self) -> None:
+        GLState.blend_func(GL_SRC_ALPHA, GL_ONE)
+        self.shader.use()
+        self.shader.set_vec4("uvRect", self.texture.uv_rect)
+        self.shader.set_float("time", self.time)
+        self.shader.set_float("lifetime", PARTICLE_LIFE)
+        self.shader.set_float("fade", PARTICLE_FADE)
+        GLState.active_texture(GL_TEXTURE0)
+        self.texture.bind()
+
+        GLState.bind_vertex_array(self.vao)
+        glDrawArraysInstanced(GL_TRIANGLES, 0, 6, self.amount)
+
+        GLState.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+    # returns the indices of count particles to respawn, popped from the free
+    # stack; when too few particles are dead, the ones closest to dying are
+    # reused (if this happens repeatedly, more particles should be reserved)
+    def unused_particles(self, count: int) -> np.ndarray:
+        count = min(count, self.amount)
+        popped = min(count, self.free_count)
+        indices = self.free[self.free_count - popped:self.free_count].copy()
+        self.free_count -= popped
+
+        missing = count - popped
+        if missing > 0:
+            life = np.where(self.alive, self.life, np.inf)
+            life[indices] = np.inf
+            indices = np.concatenate((indices, np.argpartition(life, missing - 1)[:missing]))
+        return indices
+
+    def respawn_particles(self, indices: np.ndarray, go: GameObject, offset: glm.vec2 = glm.vec2(0.0, 0.0)) -> None:
+        count = len(indices)
+        random = self.rng.integers(0, 100, size=(2, count))
+        rnd = (random[0] - 50) / 10.0
+        r_color = 0.5 + random[1] / 100.0
+
+        self.position[indices, 0] = go.position.x + offset.x + rnd
+        self.position[indices, 1] = go.position.y + offset.y + rnd
+        self.color[indices, 0:3] = r_color[:, np.newaxis]
+        self.color[indices, 3] = 1.0
+        self.life[indices] = PARTICLE_LIFE
+        self.velocity[indices] = (go.velocity.x * 0.1, go.velocity.y * 0.1)
+        self.alive[indices] = True
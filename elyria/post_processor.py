@@ -1,12 +1,26 @@
 import glm
 import numpy as np
 from OpenGL.GL import *
+from elyria.gl_state import GLState
 from elyria.texture2d import Texture2D
 from elyria.sprite_renderer import SpriteRenderer
 from elyria.shader import Shader
 from typing import Optional
 
 
+# every effect_defines() result: confuse or chaos (or neither), with or without shake
+EFFECT_COMBINATIONS = [
+    (), ("CONFUSE",), ("CHAOS",),
+    ("SHAKE",), ("CONFUSE", "SHAKE"), ("CHAOS", "SHAKE")
+]
+
+
+# PostProcessor hosts all post-processing effects of a game. It renders the game
+# to an offscreen target, render_scale times the window size and multisampled
+# with the given number of samples (0 disables multisampling), then upscales it
+# to the window with a full-screen pass applying the effects. Every combination
+# of effects gets its own specialized shader variant; with no effect active at
+# full scale the game renders straight to the window instead.
 class PostProcessor:
     def __init__(
         self,
@@ -16,11 +30,16 @@ class PostProcessor:
         texture: Optional[Texture2D] = None,
         confuse: bool = False,
         chaos: bool = False,
-        shake: bool = False
+        shake: bool = False,
+        render_scale: float = 1.0,
+        samples: int = 4
     ):
         self.post_processing_shader = shader
+        # size of the window framebuffer the result is drawn to
         self.width = width
         self.height = height
+        self.render_scale = render_scale
+        self.samples = samples
         if texture is None:
             self.texture = Texture2D(width, height)
         else:
@@ -29,32 +48,55 @@ class PostProcessor:
         self.chaos = chaos
         self.shake = shake
 
-        # initialize renderbuffer / framebuffer object
+        # initialize renderbuffer / framebuffer object
         self.msfbo = glGenFramebuffers(1)
         self.fbo = glGenFramebuffers(1)
         self.rbo = glGenRenderbuffers(1)
+        self.create_targets()
 
-        # initialize renderbuffer storage with a multisampled color buffer (don't need a depth/stencil buffer)
-        glBindFramebuffer(GL_FRAMEBUFFER, self.msfbo)
-        glBindRenderbuffer(GL_RENDERBUFFER, self.rbo)
-        glRenderbufferStorageMultisample(GL_RENDERBUFFER, 4, GL_RGB, width, height)  # allocate storage for render buffer object
-        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.rbo)  # attach MS render buffer object to framebuffer
-        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
-            print("ERROR::POSTPROCESSOR: Failed to initialize MSFBO")
-
-        # also initialize the FBO/texture to blit multisampled color-buffer;
-        # used for shader operations (for postprocessing effects)
-        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
-        self.texture.generate(None)
-        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.texture.id, 0)  # attach texture to framebuffer as its color attachment
-        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
-            print("ERROR::POSTPROCESSOR: Failed to initialize FBO")
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
-
-        # initialize render data and uniforms
+        # initialize render data
         self.init_render_data()
-        self.post_processing_shader.use()
-        self.post_processing_shader.set_int("scene", 0)
+
+        # effect defines -> shader variant with its uniforms set up; all of them
+        # are built now, so that an effect first turning on mid-game doesn't
+        # stall the frame compiling one
+        self.variants: dict[tuple[str, ...], Shader] = {}
+        for defines in EFFECT_COMBINATIONS:
+            self.build_variant(defines)
+        # whether the current frame renders straight to the window
+        self.bypassed = False
+
+    # the preprocessor symbols selecting the active effects; chaos takes
+    # precedence over confuse
+    def effect_defines(self) -> tuple[str, ...]:
+        defines = []
+        if self.chaos:
+            defines.append("CHAOS")
+        elif self.confuse:
+            defines.append("CONFUSE")
+        if self.shake:
+            defines.append("SHAKE")
+        return tuple(defines)
+
+    # returns the post-processing shader specialized for the active effects
+    def variant(self) -> Shader:
+        defines = self.effect_defines()
+        shader = self.variants.get(defines)
+        if shader is None:
+            shader = self.build_variant(defines)
+        return shader
+
+    # compiles (or loads from the program binary cache) and configures a variant
+    def build_variant(self, defines: tuple[str, ...]) -> Shader:
+        shader = self.post_processing_shader.variant(defines)
+        self.configure_variant(shader)
+        self.variants[defines] = shader
+        return shader
+
+    # sets the uniforms of a shader variant that never change
+    def configure_variant(self, shader: Shader) -> None:
+        shader.use()
+        shader.set_int("scene", 0)
 
         offset = 1.0 / 300.0
         offsets = np.array([
@@ -68,52 +110,120 @@ class PostProcessor:
                 [ 0.0,    -offset],  # bottom-center
                 [ offset, -offset]   # bottom-right
         ], dtype=np.float32)
-        glUniform2fv(glGetUniformLocation(self.post_processing_shader.id, "offsets"), len(offsets), offsets)
+        glUniform2fv(shader.location("offsets"), len(offsets), offsets)
         
         edge_kernel = np.array([
             -1, -1, -1,
             -1,  8, -1,
             -1, -1, -1
         ], dtype=np.int32)
-        glUniform1iv(glGetUniformLocation(self.post_processing_shader.id, "edge_kernel"), len(edge_kernel), edge_kernel)
+        glUniform1iv(shader.location("edge_kernel"), len(edge_kernel), edge_kernel)
 
         blur_kernel = np.array([
             1.0 / 16.0, 2.0 / 16.0, 1.0 / 16.0,
             2.0 / 16.0, 4.0 / 16.0, 2.0 / 16.0,
             1.0 / 16.0, 2.0 / 16.0, 1.0 / 16.0
         ], dtype=np.float32)
-        glUniform1fv(glGetUniformLocation(self.post_processing_shader.id, "blur_kernel"), len(blur_kernel), blur_kernel)
+        glUniform1fv(shader.location("blur_kernel"), len(blur_kernel), blur_kernel)
+
+    # size of the offscreen target
+    @property
+    def render_size(self) -> tuple[int, int]:
+        return (
+            max(1, round(self.width * self.render_scale)),
+            max(1, round(self.height * self.render_scale))
+        )
+
+    # (re)allocates the offscreen render targets at the current render size
+    def create_targets(self) -> None:
+        width, height = self.render_size
+
+        if self.samples > 0:
+            # initialize renderbuffer storage with a multisampled color buffer (don't need a depth/stencil buffer)
+            GLState.bind_framebuffer(GL_FRAMEBUFFER, self.msfbo)
+            glBindRenderbuffer(GL_RENDERBUFFER, self.rbo)
+            glRenderbufferStorageMultisample(GL_RENDERBUFFER, self.samples, GL_RGB, width, height)  # allocate storage for render buffer object
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.rbo)  # attach MS render buffer object to framebuffer
+            if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+                print("ERROR::POSTPROCESSOR: Failed to initialize MSFBO")
+
+        # also initialize the FBO/texture to blit multisampled color-buffer;
+        # used for shader operations (for postprocessing effects). Without
+        # multisampling the game renders into it directly.
+        GLState.bind_framebuffer(GL_FRAMEBUFFER, self.fbo)
+        self.texture.width = width
+        self.texture.height = height
+        self.texture.generate(None)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.texture.id, 0)  # attach texture to framebuffer as its color attachment
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            print("ERROR::POSTPROCESSOR: Failed to initialize FBO")
+        GLState.bind_framebuffer(GL_FRAMEBUFFER, 0)
 
-    # prepares the postprocessor's framebuffer operations before rendering the game
+    # adapts the render targets to a new window framebuffer size
+    def resize(self, width: int, height: int) -> None:
+        if (width, height) == (self.width, self.height) or width <= 0 or height <= 0:
+            return
+        self.width = width
+        self.height = height
+        self.create_targets()
+
+    # changes the render scale; the targets are only recreated when their size changes
+    def set_render_scale(self, render_scale: float) -> None:
+        previous = self.render_size
+        self.render_scale = render_scale
+        if self.render_size != previous:
+            self.create_targets()
+
+    # whether the offscreen pass can be skipped: without any effect and at full
+    # scale the final pass would only copy the scene
+    def bypass(self) -> bool:
+        return not (self.chaos or self.confuse or self.shake) and self.render_size == (self.width, self.height)
+
+    # prepares the postprocessor's framebuffer operations before rendering the game;
+    # when bypassed the game renders straight to the window
     def begin_render(self) -> None:
-        glBindFramebuffer(GL_FRAMEBUFFER, self.msfbo)
+        self.bypassed = self.bypass()
+        if self.bypassed:
+            GLState.bind_framebuffer(GL_FRAMEBUFFER, 0)
+            glViewport(0, 0, self.width, self.height)
+        else:
+            GLState.bind_framebuffer(GL_FRAMEBUFFER, self.msfbo if self.samples > 0 else self.fbo)
+            glViewport(0, 0, *self.render_size)
         glClearColor(0.0, 0.0, 0.0, 1.0)
         glClear(GL_COLOR_BUFFER_BIT)
 
     # should be called after rendering the game, so it stores all the rendered data into a texture object
     def end_render(self) -> None:
-        # now resolve multisampled color-buffer into intermediate fbo
-        # to store to texture
-        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.msfbo)
-        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self.fbo)
-        glBlitFramebuffer(0, 0, self.width, self.height, 0, 0, self.width, self.height, GL_COLOR_BUFFER_BIT, GL_NEAREST)
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)  # binds both READ and WRITE framebuffer to default framebuffer
-
-    # renders the PostProcesor texture quad (as a screen-encompassing large sprite)
+        if self.bypassed:
+            return
+        if self.samples > 0:
+            # now resolve multisampled color-buffer into intermediate fbo
+            # to store to texture
+            width, height = self.render_size
+            GLState.bind_framebuffer(GL_READ_FRAMEBUFFER, self.msfbo)
+            GLState.bind_framebuffer(GL_DRAW_FRAMEBUFFER, self.fbo)
+            glBlitFramebuffer(0, 0, width, height, 0, 0, width, height, GL_COLOR_BUFFER_BIT, GL_NEAREST)
+        GLState.bind_framebuffer(GL_FRAMEBUFFER, 0)  # binds both READ and WRITE framebuffer to default framebuffer
+
+        # the final pass (and anything drawn after it) covers the whole window
+        glViewport(0, 0, self.width, self.height)
+
+    # renders the PostProcesor texture quad (as a screen-encompassing large sprite),
+    # upscaling the offscreen target to the window
     def render(self, time: float) -> None:
+        if self.bypassed:
+            return
+
         # set uniforms/options
-        self.post_processing_shader.use()
-        self.post_processing_shader.set_float("time", time)
-        self.post_processing_shader.set_bool("confuse", self.confuse)
-        self.post_processing_shader.set_bool("chaos", self.chaos)
-        self.post_processing_shader.set_bool("shake", self.shake)
+        shader = self.variant()
+        shader.use()
+        shader.set_float("time", time)
 
         # render textured quad
-        glActiveTexture(GL_TEXTURE0)
+        GLState.active_texture(GL_TEXTURE0)
         self.texture.bind()
-        glBindVertexArray(self.vao)
+        GLState.bind_vertex_array(self.vao)
         glDrawArrays(GL_TRIANGLES, 0, 6)
-        glBindVertexArray(0)
 
     # initialize quad for rendering postprocessing texture
     def init_render_data(self) -> None:
@@ -131,11 +241,11 @@ class PostProcessor:
         self.vao = glGenVertexArrays(1)
         vbo = glGenBuffers(1)
 
-        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, vbo)
         glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
 
-        glBindVertexArray(self.vao)
+        GLState.bind_vertex_array(self.vao)
         glEnableVertexAttribArray(0)
         glVertexAttribPointer(0, 4, GL_FLOAT, GL_FALSE, 4 * glm.sizeof(glm.float32), ctypes.c_void_p(0))
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
-        glBindVertexArray(0)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, 0)
+        GLState.bind_vertex_array(0)
@@ -0,0 +1,54 @@
+from typing import Optional
+
+
+# Adjusts the render scale of a PostProcessor from measured render times to
+# hold a target frame rate: the scale drops a step while frames take too long
+# to render and grows back once they have enough headroom. Render times must
+# leave out the vsync wait, which would keep every frame at the refresh
+# interval and the scale from ever growing back. They are smoothed and the
+# scale changes at most once per interval, so it doesn't oscillate.
+class ResolutionController:
+    def __init__(
+        self,
+        target_fps: float = 60.0,
+        min_scale: float = 0.5,
+        max_scale: float = 1.0,
+        step: float = 0.1,
+        interval: float = 0.5,
+        render_scale: float = 1.0
+    ):
+        self.target_frame_time = 1.0 / target_fps
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.step = step
+        self.interval = interval
+        self.render_scale = min(max(render_scale, min_scale), max_scale)
+
+        # exponentially smoothed render time, in seconds
+        self.frame_time: Optional[float] = None
+        # time since the scale last changed
+        self.elapsed = 0.0
+
+    # records a frame: its duration and the time spent rendering it (the
+    # duration when not given); returns the new render scale when it changes
+    def update(self, dt: float, render_time: Optional[float] = None) -> Optional[float]:
+        if render_time is None:
+            render_time = dt
+        if dt <= 0.0 or render_time <= 0.0:
+            return None
+        self.frame_time = render_time if self.frame_time is None else 0.9 * self.frame_time + 0.1 * render_time
+        self.elapsed += dt
+        if self.elapsed < self.interval:
+            return None
+
+        scale = self.render_scale
+        if self.frame_time > self.target_frame_time * 1.05:
+            scale = max(self.min_scale, scale - self.step)
+        elif self.frame_time < self.target_frame_time * 0.85:
+            scale = min(self.max_scale, scale + self.step)
+        if scale == self.render_scale:
+            return None
+
+        self.render_scale = scale
+        self.elapsed = 0.0
+        return scale
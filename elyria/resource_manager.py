@@ -1,17 +1,42 @@
+import os
+import re
+import json
+import ctypes
+import hashlib
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from OpenGL.GL import *
-from pygame import mixer
-from PIL import Image
+from elyria.cache import cache_path, source_key
+from elyria.gl_state import GLState
 from elyria.texture2d import Texture2D
+from elyria.texture_atlas import SubTexture2D, pack_images
+from elyria.texture_residency import TextureHandle, TextureResidency
 from elyria.shader import Shader
-from typing import Optional
+from elyria.uniform_buffer import UniformBuffer
+from typing import Optional, TYPE_CHECKING
+
+# PIL and pygame are imported by the functions using them, so that importing
+# the ResourceManager stays cheap
+if TYPE_CHECKING:
+    from pygame import mixer
+    from elyria.music_stream import MusicStream
 
 
 class ResourceManager:
     # resource storage
     shaders: dict[str, Shader] = {}
-    textures: dict[str, Texture2D] = {}
-    audios: dict[str, mixer.Sound] = {}
+    textures: dict[str, Texture2D | SubTexture2D | TextureHandle] = {}
+    atlases: dict[str, list[Texture2D]] = {}
+    audios: dict[str, "mixer.Sound"] = {}
+    streams: dict[str, "MusicStream"] = {}
+    uniform_buffers: dict[str, UniformBuffer] = {}
+
+    # keeps the textures loaded with load_managed_texture within a memory budget
+    residency: TextureResidency
+
+    # when enabled, decoded images are kept on disk as raw pixels and
+    # memory-mapped on later loads instead of being decoded again
+    pixel_cache = False
 
     # loads (and generates) a shader program from file loading 
     # vertex, fragment (and geometry) shader's source code.
@@ -27,40 +52,223 @@ class ResourceManager:
     def get_shader(name: str) -> Optional[Shader]:
         return ResourceManager.shaders.get(name)
 
+    # creates a uniform buffer for the named uniform block, attached to the given binding point
+    @staticmethod
+    def load_uniform_buffer(name: str, size: int, binding: int) -> UniformBuffer:
+        ResourceManager.uniform_buffers[name] = UniformBuffer(name, size, binding)
+        return ResourceManager.uniform_buffers[name]
+
+    # retrieves a stored uniform buffer
+    @staticmethod
+    def get_uniform_buffer(name: str) -> Optional[UniformBuffer]:
+        return ResourceManager.uniform_buffers.get(name)
+
     # loads (and generates) a texture from file
     @staticmethod
     def load_texture(file: str, alpha: bool, name: str) -> Texture2D:
         ResourceManager.textures[name] = ResourceManager.load_texture_from_file(file, alpha)
         return ResourceManager.textures[name]
 
+    # loads (and generates) several textures at once. The images are decoded on a
+    # thread pool (PIL releases the GIL while decoding) and streamed into their
+    # textures through a pixel buffer as soon as each one is ready, so loading
+    # takes about as long as the largest image. Entries are (file, alpha, name)
+    # as for load_texture; textures that fail to load are None.
+    @staticmethod
+    def load_textures(entries: list[tuple[str, bool, str]], workers: Optional[int] = None) -> list[Optional[Texture2D]]:
+        textures: list[Optional[Texture2D]] = [None] * len(entries)
+        if not entries:
+            return textures
+
+        pbo = glGenBuffers(1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(ResourceManager.decode_image, file, "RGBA" if alpha else "RGB"): i
+                for i, (file, alpha, _) in enumerate(entries)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                file, alpha, name = entries[i]
+                image_data = future.result()
+                if image_data is None:
+                    continue
+                texture = ResourceManager.create_texture(image_data, alpha, pbo)
+                ResourceManager.textures[name] = texture
+                textures[i] = texture
+        GLState.delete_buffer(pbo)
+        return textures
+
+    # registers a texture whose GPU memory is managed by the residency manager:
+    # it's only uploaded once used, may be evicted when the budget is exceeded
+    # and is then loaded again on next use. Returns a handle holding a reference.
+    @staticmethod
+    def load_managed_texture(file: str, alpha: bool, name: str) -> TextureHandle:
+        ResourceManager.textures[name] = ResourceManager.residency.register(name, file, alpha)
+        return ResourceManager.textures[name]
+
     # retrieves a stored texture
     @staticmethod
-    def get_texture(name: str) -> Optional[Texture2D]:
+    def get_texture(name: str) -> Optional[Texture2D | SubTexture2D | TextureHandle]:
         return ResourceManager.textures.get(name)
+
+    # packs small textures into one or more atlas pages and stores a SubTexture2D
+    # for every entry, so sprites using any of them can be drawn in one batch.
+    # Entries are (file, alpha, name) as for load_texture. The packed pages are
+    # cached on disk and reused until one of the source files changes.
+    @staticmethod
+    def load_atlas(
+        name: str,
+        entries: list[tuple[str, bool, str]],
+        padding: int = 2,
+        max_size: int = 2048
+    ) -> list[SubTexture2D]:
+        try:
+            key = source_key(
+                [file for file, _, _ in entries],
+                [(alpha, texture_name) for _, alpha, texture_name in entries],
+                padding,
+                max_size
+            )
+        except OSError as e:
+            print(f"ERROR::ATLAS: Failed to load atlas {name}\n{e}")
+            return []
+        index_file = cache_path("atlas", f"{name}-{key}.json")
+
+        from PIL import Image
+
+        # try the packed pages of a previous run first
+        pages = None
+        if os.path.exists(index_file):
+            try:
+                with open(index_file) as f:
+                    index = json.load(f)
+                pages = [
+                    np.array(Image.open(cache_path("atlas", page)).convert("RGBA"), dtype=np.uint8)
+                    for page in index["pages"]
+                ]
+                placements = [tuple(placement) for placement in index["regions"]]
+            except Exception as e:
+                print(f"ERROR::ATLAS: Failed to load cached atlas {name}, repacking\n{e}")
+                pages = None
+
+        if pages is None:
+            # decode all images in parallel; images without alpha are made opaque
+            with ThreadPoolExecutor() as executor:
+                images = list(executor.map(
+                    lambda entry: ResourceManager.decode_image(entry[0], "RGBA" if entry[1] else "RGB", "RGBA"),
+                    entries
+                ))
+            if any(image is None for image in images):
+                return []
+            pages, positions = pack_images(images, padding, max_size)
+            placements = [
+                (page, x, y, image.shape[1], image.shape[0])
+                for (page, x, y), image in zip(positions, images)
+            ]
+
+            # store the pages for the next run; the index is written last so
+            # that an interrupted write is never picked up
+            page_files = [f"{name}-{key}-{i}.png" for i in range(len(pages))]
+            for page, page_file in zip(pages, page_files):
+                Image.fromarray(page).save(cache_path("atlas", page_file))
+            with open(index_file, "w") as f:
+                json.dump({"pages": page_files, "regions": placements}, f)
+            ResourceManager.remove_stale_atlas(name, {os.path.basename(index_file), *page_files})
+
+        # upload the pages and hand out their regions
+        atlas = []
+        for page in pages:
+            texture = Texture2D(
+                internal_format=GL_RGBA,
+                image_format=GL_RGBA,
+                wrap_s=GL_CLAMP_TO_EDGE,
+                wrap_t=GL_CLAMP_TO_EDGE
+            )
+            texture.width = page.shape[1]
+            texture.height = page.shape[0]
+            texture.generate(page)
+            atlas.append(texture)
+        ResourceManager.atlases[name] = atlas
+
+        regions = []
+        for (_, _, texture_name), (page, x, y, width, height) in zip(entries, placements):
+            region = SubTexture2D(atlas[page], x, y, width, height)
+            ResourceManager.textures[texture_name] = region
+            regions.append(region)
+        return regions
     
-    # loads an audio from file
-    def load_music(file: str, name: str) -> mixer.Sound:
-        ResourceManager.audios[name] = mixer.Sound(file)
+    # removes the cached pages and index of previous versions of an atlas
+    @staticmethod
+    def remove_stale_atlas(name: str, keep: set[str]) -> None:
+        pattern = re.compile(rf"{re.escape(name)}-[0-9a-f]{{40}}(-\d+\.png|\.json)")
+        directory = os.path.dirname(cache_path("atlas", name))
+        for file in os.listdir(directory):
+            if file not in keep and pattern.fullmatch(file):
+                try:
+                    os.remove(os.path.join(directory, file))
+                except OSError as e:
+                    print(f"ERROR::ATLAS: Failed to remove stale atlas file {file}\n{e}")
+
+    # loads an audio from file; its decoded PCM is cached, so later runs build
+    # the sound from the cache instead of decoding the file again
+    @staticmethod
+    def load_music(file: str, name: str) -> "mixer.Sound":
+        from pygame import mixer
+        from elyria.audio_cache import load_pcm, store_pcm
+
+        pcm = load_pcm(file)
+        if pcm is not None:
+            ResourceManager.audios[name] = mixer.Sound(buffer=pcm)
+        else:
+            ResourceManager.audios[name] = mixer.Sound(file)
+            store_pcm(file, ResourceManager.audios[name].get_view())
         return ResourceManager.audios[name]
+
+    # registers a long music track that is streamed in chunks when played,
+    # instead of being decoded into memory
+    @staticmethod
+    def load_stream(file: str, name: str) -> "MusicStream":
+        from elyria.music_stream import MusicStream
+
+        ResourceManager.streams[name] = MusicStream(file)
+        return ResourceManager.streams[name]
     
     # play a stored music
     @staticmethod
-    def play_music(name: str) -> None:
+    def play_music(name: str, loop: bool = False) -> None:
+        stream = ResourceManager.streams.get(name)
+        if stream:
+            stream.play(loop)
+            return
         audio = ResourceManager.audios.get(name)
         if audio:
-            audio.play()
+            audio.play(-1 if loop else 0)
 
     # properly de-allocates all loaded resources
     @staticmethod
     def clear() -> None:
-        # properly delete all shaders
+        # stop the music streams
+        for stream in ResourceManager.streams.values():
+            stream.stop()
+
+        # properly delete all shaders, with their variants
         for shader in ResourceManager.shaders.values():
-            glDeleteProgram(shader.id)
+            for variant in shader.variants.values():
+                GLState.delete_program(variant.id)
 
-        # properly delete all textures
+        # properly delete all textures (atlas regions are deleted with their
+        # atlas, managed textures by the residency manager)
         for texture in ResourceManager.textures.values():
-            texture_id = np.array([texture.id], dtype=np.uint32)
-            glDeleteTextures(1, texture_id)
+            if isinstance(texture, Texture2D):
+                GLState.delete_texture(texture.id)
+        ResourceManager.residency.clear()
+        for atlas in ResourceManager.atlases.values():
+            for texture in atlas:
+                GLState.delete_texture(texture.id)
+
+        # properly delete all uniform buffers
+        for uniform_buffer in ResourceManager.uniform_buffers.values():
+            GLState.delete_buffer(uniform_buffer.id)
 
     # loads and generates a shader from file
     @staticmethod
@@ -71,6 +279,79 @@ class ResourceManager:
     # loads a single texture from file
     @staticmethod
     def load_texture_from_file(file: str, alpha: bool) -> Texture2D:
+        # load image
+        image_data = ResourceManager.decode_image(file, "RGBA" if alpha else "RGB")
+        if image_data is None:
+            return None
+
+        # now generate texture
+        return ResourceManager.create_texture(image_data, alpha)
+
+    # decodes an image file into an array of pixels in the given PIL mode,
+    # converted to a second mode if given; thread-safe, returns None on failure
+    @staticmethod
+    def decode_image(file: str, mode: str, *modes: str) -> Optional[np.ndarray]:
+        if ResourceManager.pixel_cache:
+            pixels = ResourceManager.load_cached_pixels(file, (mode, *modes))
+            if pixels is not None:
+                return pixels
+
+        from PIL import Image
+
+        try:
+            image = Image.open(file).convert(mode)
+            for then in modes:
+                image = image.convert(then)
+            pixels = np.asarray(image, dtype=np.uint8)
+        except Exception as e:
+            print(f"ERROR::TEXTURE: Failed to load texture file {file}\n{e}")
+            return None
+
+        if ResourceManager.pixel_cache:
+            ResourceManager.store_cached_pixels(file, (mode, *modes), pixels)
+        return pixels
+
+    # returns the raw pixel file and its index in the pixel cache, for an image
+    # file converted through the given modes
+    @staticmethod
+    def pixel_cache_files(file: str, modes: tuple[str, ...]) -> tuple[str, str]:
+        name = hashlib.sha1(f"{os.path.abspath(file)}|{'|'.join(modes)}".encode()).hexdigest()
+        return cache_path("pixels", f"{name}.raw"), cache_path("pixels", f"{name}.json")
+
+    # memory-maps the cached pixels of an image; returns None when they are
+    # missing or the source image changed since they were stored
+    @staticmethod
+    def load_cached_pixels(file: str, modes: tuple[str, ...]) -> Optional[np.ndarray]:
+        raw_file, index_file = ResourceManager.pixel_cache_files(file, modes)
+        try:
+            with open(index_file) as f:
+                index = json.load(f)
+            stat = os.stat(file)
+            if index["mtime"] != stat.st_mtime_ns or index["size"] != stat.st_size:
+                return None
+            return np.memmap(raw_file, dtype=np.uint8, mode="r", shape=tuple(index["shape"]))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    # stores decoded pixels in the pixel cache; the index is written last so
+    # that an interrupted write is never picked up
+    @staticmethod
+    def store_cached_pixels(file: str, modes: tuple[str, ...], pixels: np.ndarray) -> None:
+        raw_file, index_file = ResourceManager.pixel_cache_files(file, modes)
+        try:
+            stat = os.stat(file)
+            np.ascontiguousarray(pixels).tofile(raw_file + ".tmp")
+            os.replace(raw_file + ".tmp", raw_file)
+            with open(index_file + ".tmp", "w") as f:
+                json.dump({"mtime": stat.st_mtime_ns, "size": stat.st_size, "shape": pixels.shape}, f)
+            os.replace(index_file + ".tmp", index_file)
+        except OSError as e:
+            print(f"ERROR::TEXTURE: Failed to cache pixels of {file}\n{e}")
+
+    # creates a texture from decoded pixels; when a pixel buffer is given the
+    # pixels are streamed through it instead of being handed to glTexImage2D
+    @staticmethod
+    def create_texture(image_data: np.ndarray, alpha: bool, pbo: Optional[int] = None) -> Texture2D:
         # create texture object
         texture = Texture2D()
         if alpha:
@@ -79,23 +360,28 @@ class ResourceManager:
         else:
             texture.internal_format = GL_RGB
             texture.image_format = GL_RGB
+        texture.width = image_data.shape[1]
+        texture.height = image_data.shape[0]
 
-        # load image
-        try:
-            image = Image.open(file)
-            if alpha:
-                image = image.convert("RGBA")
-            else:
-                image = image.convert("RGB")
-            image_data = np.array(image, dtype=np.uint8)
-        except Exception as e:
-            print(f"ERROR::TEXTURE: Failed to load texture file {file}\n{e}")
-            return None
-        
-        # now generate texture
-        texture.width = image.width
-        texture.height = image.height
-        texture.generate(image_data)
+        if pbo is None:
+            texture.generate(image_data)
+            return texture
+
+        # orphan the previous contents, so the driver doesn't wait for the
+        # previous upload, and copy the pixels into the mapped buffer
+        image_data = np.ascontiguousarray(image_data)
+        GLState.bind_buffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+        glBufferData(GL_PIXEL_UNPACK_BUFFER, image_data.nbytes, None, GL_STREAM_DRAW)
+        pointer = glMapBufferRange(
+            GL_PIXEL_UNPACK_BUFFER, 0, image_data.nbytes, GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_BUFFER_BIT
+        )
+        ctypes.memmove(pointer, image_data.ctypes.data, image_data.nbytes)
+        glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
 
+        # with a pixel buffer bound, the texture data is read from offset 0 of it
+        texture.generate(None)
+        GLState.bind_buffer(GL_PIXEL_UNPACK_BUFFER, 0)
         return texture
-    
\ No newline at end of file
+
+
+ResourceManager.residency = TextureResidency(ResourceManager.load_texture_from_file)
@@ -1,9 +1,48 @@
+import os
+import hashlib
 from OpenGL.GL import *
+from OpenGL.error import GLError
+from elyria.cache import cache_path
+from elyria.gl_state import GLState
+from typing import Iterable, Optional
 import glm
+import numpy as np
 
 
+# A shader program compiled from source files. Preprocessor symbols can be
+# defined to specialize the sources; variant() compiles (once) the same sources
+# with another set of symbols, so features can be selected without branching
+# at runtime. Linked programs are cached on disk as driver binaries and reloaded
+# on later runs instead of being compiled again.
 class Shader:
-    def __init__(self, vertex_path: str, fragment_path: str, geometry_path: str = None) -> None:
+    # whether linked programs are stored to and loaded from the binary cache
+    binary_cache = True
+    # programs loaded from the binary cache / compiled from source so far
+    binary_hits = 0
+    binary_misses = 0
+    # "vendor|renderer|version" of the GL driver, binaries are only valid for it
+    driver: Optional[str] = None
+
+    def __init__(
+        self,
+        vertex_path: str,
+        fragment_path: str,
+        geometry_path: str = None,
+        defines: Iterable[str] = ()
+    ) -> None:
+        self.vertex_path = vertex_path
+        self.fragment_path = fragment_path
+        self.geometry_path = geometry_path
+        # preprocessor symbols defined in every stage, sorted
+        self.defines: tuple[str, ...] = tuple(sorted(set(defines)))
+        # defines -> program compiled from the same sources, including this one
+        self.variants: dict[tuple[str, ...], Shader] = {self.defines: self}
+
+        # uniform name -> location, filled in once the program is linked
+        self.uniforms: dict[str, int] = {}
+        # uniform location -> last uploaded value, used to skip redundant uploads
+        self.values: dict[int, object] = {}
+
         # 1. retrieve the vertex/fragment source code from filepath
         try:
             # open files
@@ -25,86 +64,261 @@ class Shader:
                 geometry_code = g_shader_file.read()
                 g_shader_file.close()
 
-            # 2. compile shaders
-            # vertex shader
-            vertex = glCreateShader(GL_VERTEX_SHADER)
-            glShaderSource(vertex, vertex_code)
-            glCompileShader(vertex)
-            self.check_compile_errors(vertex, "VERTEX")
+            vertex_code = self.inject_defines(vertex_code)
+            fragment_code = self.inject_defines(fragment_code)
+            if geometry_code:
+                geometry_code = self.inject_defines(geometry_code)
 
-            # fragment shader
-            fragment = glCreateShader(GL_FRAGMENT_SHADER)
-            glShaderSource(fragment, fragment_code)
-            glCompileShader(fragment)
-            self.check_compile_errors(fragment, "FRAGMENT")
+            # 2. reuse the program linked by a previous run, or compile it
+            binary_file = self.binary_file(vertex_code, fragment_code, geometry_code)
+            if binary_file and self.load_binary(binary_file):
+                Shader.binary_hits += 1
+            else:
+                Shader.binary_misses += 1
+                self.compile(vertex_code, fragment_code, geometry_code)
+                if binary_file:
+                    self.save_binary(binary_file)
+            self.reflect_uniforms()
 
-            # geometry shader
-            if geometry_path:
-                geometry = glCreateShader(GL_GEOMETRY_SHADER)
-                glShaderSource(geometry, geometry_code)
-                glCompileShader(geometry)
-                self.check_compile_errors(geometry, "GEOMETRY")
+        except IOError:
+            print("ERROR::SHADER::FILE_NOT_SUCCESSFULLY_READ")
 
-            # shader program
-            self.id = glCreateProgram()
-            glAttachShader(self.id, vertex)
-            glAttachShader(self.id, fragment)
+    # compiles and links the program from source
+    def compile(self, vertex_code: str, fragment_code: str, geometry_code: Optional[str]) -> None:
+        # vertex shader
+        vertex = glCreateShader(GL_VERTEX_SHADER)
+        glShaderSource(vertex, vertex_code)
+        glCompileShader(vertex)
+        self.check_compile_errors(vertex, "VERTEX")
 
-            if geometry_path:
-                glAttachShader(self.id, geometry)
+        # fragment shader
+        fragment = glCreateShader(GL_FRAGMENT_SHADER)
+        glShaderSource(fragment, fragment_code)
+        glCompileShader(fragment)
+        self.check_compile_errors(fragment, "FRAGMENT")
 
-            glLinkProgram(self.id)
-            self.check_compile_errors(self.id, "PROGRAM")
+        # geometry shader
+        if geometry_code:
+            geometry = glCreateShader(GL_GEOMETRY_SHADER)
+            glShaderSource(geometry, geometry_code)
+            glCompileShader(geometry)
+            self.check_compile_errors(geometry, "GEOMETRY")
 
-            # delete the shaders as they're linked into our program now and no longer necessary
-            glDeleteShader(vertex)
-            glDeleteShader(fragment)
-            if geometry_path:
-                glDeleteShader(geometry)
+        # shader program
+        self.id = glCreateProgram()
+        glAttachShader(self.id, vertex)
+        glAttachShader(self.id, fragment)
 
-        except IOError:
-            print("ERROR::SHADER::FILE_NOT_SUCCESSFULLY_READ")
+        if geometry_code:
+            glAttachShader(self.id, geometry)
+
+        # keep the linked binary retrievable for the binary cache
+        if Shader.binary_cache:
+            glProgramParameteri(self.id, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+
+        glLinkProgram(self.id)
+        self.check_compile_errors(self.id, "PROGRAM")
+
+        # delete the shaders as they're linked into our program now and no longer necessary
+        glDeleteShader(vertex)
+        glDeleteShader(fragment)
+        if geometry_code:
+            glDeleteShader(geometry)
+
+    # returns the binary cache file of a program built from the given sources,
+    # or None when the driver can't provide program binaries
+    def binary_file(self, vertex_code: str, fragment_code: str, geometry_code: Optional[str]) -> Optional[str]:
+        if not Shader.binary_cache:
+            return None
+        if Shader.driver is None:
+            try:
+                if not bool(glGetProgramBinary) or glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) == 0:
+                    Shader.binary_cache = False
+                    return None
+                Shader.driver = "|".join(
+                    (glGetString(name) or b"").decode(errors="replace")
+                    for name in (GL_VENDOR, GL_RENDERER, GL_VERSION)
+                )
+            except Exception:
+                Shader.binary_cache = False
+                return None
+
+        digest = hashlib.sha1()
+        for code in (vertex_code, fragment_code, geometry_code or "", Shader.driver):
+            digest.update(code.encode())
+            digest.update(b"\0")
+        return cache_path("shaders", f"{digest.hexdigest()}.bin")
+
+    # links the program from a cached binary; returns False (a cache miss, the
+    # caller compiles from source) when there is no binary or the driver
+    # rejects it, e.g. after a driver update no longer supporting its format
+    def load_binary(self, file: str) -> bool:
+        if not os.path.exists(file):
+            return False
+        data = np.fromfile(file, dtype=np.uint8)
+        if len(data) <= 4:
+            return False
+        binary_format = int(data[:4].view(np.uint32)[0])
+
+        self.id = glCreateProgram()
+        try:
+            glProgramBinary(self.id, binary_format, data[4:], len(data) - 4)
+            if glGetProgramiv(self.id, GL_LINK_STATUS):
+                return True
+        except GLError:
+            # an unsupported binary format raises GL_INVALID_ENUM
+            pass
+
+        # the stale binary is replaced once the program is compiled again
+        GLState.delete_program(self.id)
+        try:
+            os.remove(file)
+        except OSError as e:
+            print(f"ERROR::SHADER: Failed to remove stale program binary {file}\n{e}")
+        return False
+
+    # stores the linked program in the binary cache
+    def save_binary(self, file: str) -> None:
+        try:
+            length = glGetProgramiv(self.id, GL_PROGRAM_BINARY_LENGTH)
+            if not glGetProgramiv(self.id, GL_LINK_STATUS) or length <= 0:
+                return
+            binary = np.zeros(length, dtype=np.uint8)
+            written = np.zeros(1, dtype=np.int32)
+            binary_format = np.zeros(1, dtype=np.uint32)
+            glGetProgramBinary(self.id, length, written, binary_format, binary)
+
+            # write next to the final file first, so an interrupted write is never picked up
+            with open(file + ".tmp", "wb") as f:
+                f.write(binary_format.tobytes())
+                f.write(binary[:int(written[0])].tobytes())
+            os.replace(file + ".tmp", file)
+        except Exception as e:
+            print(f"ERROR::SHADER: Failed to store program binary {file}\n{e}")
+
+    # returns the (hits, misses) of the binary cache since startup
+    @staticmethod
+    def binary_cache_stats() -> tuple[int, int]:
+        return Shader.binary_hits, Shader.binary_misses
 
     def use(self) -> None:
         # activate the shader
-        glUseProgram(self.id)
+        GLState.use_program(self.id)
+
+    # returns the program compiled from the same sources with the given
+    # preprocessor symbols defined, compiling it on first use
+    def variant(self, defines: Iterable[str]) -> "Shader":
+        key = tuple(sorted(set(defines)))
+        shader = self.variants.get(key)
+        if shader is None:
+            shader = Shader(self.vertex_path, self.fragment_path, self.geometry_path, key)
+            # all variants share one cache
+            shader.variants = self.variants
+            self.variants[key] = shader
+        return shader
+
+    # inserts the defines right after the #version directive, which must come first
+    def inject_defines(self, source: str) -> str:
+        if not self.defines:
+            return source
+        lines = source.splitlines(keepends=True)
+        at = next((i + 1 for i, line in enumerate(lines) if line.lstrip().startswith("#version")), 0)
+        return "".join(lines[:at] + [f"#define {define}\n" for define in self.defines] + lines[at:])
+
+    # introspects the active uniforms of the linked program and stores their locations
+    def reflect_uniforms(self) -> None:
+        self.uniforms.clear()
+        self.values.clear()
+        for i in range(glGetProgramiv(self.id, GL_ACTIVE_UNIFORMS)):
+            name, size, type = glGetActiveUniform(self.id, i)
+            if isinstance(name, bytes):
+                name = name.decode()
+            # arrays are reported as "name[0]"
+            if name.endswith("[0]"):
+                name = name[:-3]
+            location = glGetUniformLocation(self.id, name)
+            # uniforms living in a uniform block have no location
+            if location != -1:
+                self.uniforms[name] = location
+
+    # returns the location of a uniform or -1 if the program has no such (active) uniform
+    def location(self, name: str) -> int:
+        return self.uniforms.get(name, -1)
+
+    # binds the named uniform block of the program to a uniform buffer binding point
+    def bind_uniform_block(self, name: str, binding: int) -> None:
+        index = glGetUniformBlockIndex(self.id, name)
+        if index != GL_INVALID_INDEX:
+            glUniformBlockBinding(self.id, index, binding)
+
+    # records the value about to be uploaded at location; returns False when the
+    # upload can be skipped because the program already holds that value
+    def update_shadow(self, location: int, value) -> bool:
+        if location == -1:
+            return False
+        previous = self.values.get(location)
+        if previous is not None and previous == value:
+            return False
+        self.values[location] = value
+        return True
 
     # utility uniform function
     def set_bool(self, name: str, value: bool) -> None:
-        glUniform1i(glGetUniformLocation(self.id, name), int(value))
+        location = self.location(name)
+        if self.update_shadow(location, int(value)):
+            glUniform1i(location, int(value))
 
     def set_int(self, name: str, value: int) -> None:
-        glUniform1i(glGetUniformLocation(self.id, name), value)
+        location = self.location(name)
+        if self.update_shadow(location, value):
+            glUniform1i(location, value)
 
     def set_float(self, name: str, value: float) -> None:
-        glUniform1f(glGetUniformLocation(self.id, name), value)
+        location = self.location(name)
+        if self.update_shadow(location, value):
+            glUniform1f(location, value)
 
     def set_vec2(self, name: str, *args) -> None:
+        location = self.location(name)
         if len(args) == 1 and type(args[0]) == glm.vec2:
-            glUniform2fv(glGetUniformLocation(self.id, name), 1, glm.value_ptr(args[0]))
+            if self.update_shadow(location, glm.vec2(args[0])):
+                glUniform2fv(location, 1, glm.value_ptr(args[0]))
         elif len(args) == 2 and all(map(lambda x: type(x) == float, args)):
-            glUniform2f(glGetUniformLocation(self.id, name), *args)
+            if self.update_shadow(location, args):
+                glUniform2f(location, *args)
 
     def set_vec3(self, name: str, *args) -> None:
+        location = self.location(name)
         if len(args) == 1 and type(args[0]) == glm.vec3:
-            glUniform3fv(glGetUniformLocation(self.id, name), 1, glm.value_ptr(args[0]))
+            if self.update_shadow(location, glm.vec3(args[0])):
+                glUniform3fv(location, 1, glm.value_ptr(args[0]))
         elif len(args) == 3 and all(map(lambda x: type(x) == float, args)):
-            glUniform3f(glGetUniformLocation(self.id, name), *args)
+            if self.update_shadow(location, args):
+                glUniform3f(location, *args)
 
     def set_vec4(self, name: str, *args) -> None:
+        location = self.location(name)
         if len(args) == 1 and type(args[0]) == glm.vec4:
-            glUniform4fv(glGetUniformLocation(self.id, name), 1, glm.value_ptr(args[0]))
+            if self.update_shadow(location, glm.vec4(args[0])):
+                glUniform4fv(location, 1, glm.value_ptr(args[0]))
         elif len(args) == 4 and all(map(lambda x: type(x) == float, args)):
-            glUniform4f(glGetUniformLocation(self.id, name), *args)
+            if self.update_shadow(location, args):
+                glUniform4f(location, *args)
 
     def set_mat2(self, name: str, mat: glm.mat2) -> None:
-        glUniformMatrix2fv(glGetUniformLocation(self.id, name), 1, GL_FALSE, glm.value_ptr(mat))
+        location = self.location(name)
+        if self.update_shadow(location, glm.mat2(mat)):
+            glUniformMatrix2fv(location, 1, GL_FALSE, glm.value_ptr(mat))
 
     def set_mat3(self, name: str, mat: glm.mat3) -> None:
-        glUniformMatrix3fv(glGetUniformLocation(self.id, name), 1, GL_FALSE, glm.value_ptr(mat))
+        location = self.location(name)
+        if self.update_shadow(location, glm.mat3(mat)):
+            glUniformMatrix3fv(location, 1, GL_FALSE, glm.value_ptr(mat))
 
     def set_mat4(self, name: str, mat: glm.mat4) -> None:
-        glUniformMatrix4fv(glGetUniformLocation(self.id, name), 1, GL_FALSE, glm.value_ptr(mat))
+        location = self.location(name)
+        if self.update_shadow(location, glm.mat4(mat)):
+            glUniformMatrix4fv(location, 1, GL_FALSE, glm.value_ptr(mat))
 
     def check_compile_errors(self, shader: int, type: str) -> None:
         if type != "PROGRAM":
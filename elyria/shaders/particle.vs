@@ -1,17 +1,20 @@
 #version 330 core
 
 layout (location = 0) in vec4 vertex;  // <vec2 position, vec2 texCoords>
+layout (location = 1) in vec2 offset;  // per particle
+layout (location = 2) in vec4 color;   // per particle
 
 out vec2 TexCoords;
 out vec4 ParticleColor;
 
-uniform mat4 projection;
-uniform vec2 offset;
-uniform vec4 color;
+layout (std140) uniform Matrices {
+    mat4 projection;
+};
+uniform vec4 uvRect; // <vec2 top-left, vec2 bottom-right> texture region
 
 void main() {
     float scale = 10.0f;
-    TexCoords = vertex.zw;
+    TexCoords = mix(uvRect.xy, uvRect.zw, vertex.zw);
     ParticleColor = color;
     gl_Position = projection * vec4((vertex.xy * scale) + offset, 0.0, 1.0);
 }
@@ -0,0 +1,41 @@
+#version 330 core
+
+layout (location = 0) in vec4 vertex; // <vec2 position, vec2 texCoords>
+layout (location = 1) in vec4 spawn;  // per particle: <vec2 emitter position, vec2 velocity>
+layout (location = 2) in vec2 birth;  // per particle: <float spawn time, float seed>
+
+out vec2 TexCoords;
+out vec4 ParticleColor;
+
+layout (std140) uniform Matrices {
+    mat4 projection;
+};
+uniform vec4 uvRect; // <vec2 top-left, vec2 bottom-right> texture region
+uniform float time;
+uniform float lifetime;
+uniform float fade;  // alpha lost per second
+
+float hash(float n) {
+    return fract(sin(n) * 43758.5453);
+}
+
+void main() {
+    float age = time - birth.x;
+    TexCoords = mix(uvRect.xy, uvRect.zw, vertex.zw);
+
+    if (age < 0.0 || age >= lifetime) {
+        // dead (or unused) particle: collapse it outside of the clip volume
+        ParticleColor = vec4(0.0);
+        gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+        return;
+    }
+
+    // same random jitter and brightness as the CPU path, derived from the seed
+    float jitter = (floor(hash(birth.y * 12.9898) * 100.0) - 50.0) / 10.0;
+    float brightness = 0.5 + floor(hash(birth.y * 78.233) * 100.0) / 100.0;
+
+    float scale = 10.0f;
+    vec2 offset = spawn.xy + jitter - spawn.zw * age;
+    ParticleColor = vec4(vec3(brightness), 1.0 - fade * age);
+    gl_Position = projection * vec4((vertex.xy * scale) + offset, 0.0, 1.0);
+}
@@ -1,4 +1,5 @@
 #version 330 core
+// effects are compiled in by defining CHAOS, CONFUSE (ignored along with CHAOS) and SHAKE
 in  vec2  TexCoords;
 out vec4  color;
   
@@ -7,33 +8,27 @@ uniform vec2      offsets[9];
 uniform int       edge_kernel[9];
 uniform float     blur_kernel[9];
 
-uniform bool chaos;
-uniform bool confuse;
-uniform bool shake;
-
 void main() {
     color = vec4(0.0f);
+#if defined(CHAOS) || defined(SHAKE)
     vec3 sample[9];
     // sample from texture offsets if using convolution matrix
-    if(chaos || shake)
-        for(int i = 0; i < 9; i++)
-            sample[i] = vec3(texture(scene, TexCoords.st + offsets[i]));
+    for(int i = 0; i < 9; i++)
+        sample[i] = vec3(texture(scene, TexCoords.st + offsets[i]));
+#endif
 
     // process effects
-    if (chaos) {           
-        for(int i = 0; i < 9; i++)
-            color += vec4(sample[i] * edge_kernel[i], 0.0f);
-        color.a = 1.0f;
-    }
-    else if (confuse) {
-        color = vec4(1.0 - texture(scene, TexCoords).rgb, 1.0);
-    }
-    else if (shake) {
-        for(int i = 0; i < 9; i++)
-            color += vec4(sample[i] * blur_kernel[i], 0.0f);
-        color.a = 1.0f;
-    }
-    else {
-        color =  texture(scene, TexCoords);
-    }
-}
\ No newline at end of file
+#if defined(CHAOS)
+    for(int i = 0; i < 9; i++)
+        color += vec4(sample[i] * edge_kernel[i], 0.0f);
+    color.a = 1.0f;
+#elif defined(CONFUSE)
+    color = vec4(1.0 - texture(scene, TexCoords).rgb, 1.0);
+#elif defined(SHAKE)
+    for(int i = 0; i < 9; i++)
+        color += vec4(sample[i] * blur_kernel[i], 0.0f);
+    color.a = 1.0f;
+#else
+    color =  texture(scene, TexCoords);
+#endif
+}
@@ -5,9 +5,12 @@ layout (location = 0) in vec4 vertex; // <vec2 position, vec2 texCoords>
 out vec2 TexCoords;
 
 uniform mat4 model;
-uniform mat4 projection;
+uniform vec4 uvRect; // <vec2 top-left, vec2 bottom-right> texture region
+layout (std140) uniform Matrices {
+    mat4 projection;
+};
 
 void main() {
-    TexCoords = vertex.zw;
+    TexCoords = mix(uvRect.xy, uvRect.zw, vertex.zw);
     gl_Position = projection * model * vec4(vertex.xy, 0.0, 1.0);
 }
\ No newline at end of file
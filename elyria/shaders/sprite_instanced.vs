@@ -0,0 +1,26 @@
+#version 330 core
+
+layout (location = 0) in vec4 vertex;        // <vec2 position, vec2 texCoords>
+layout (location = 1) in vec4 instanceRect;  // <vec2 position, vec2 size>
+layout (location = 2) in vec4 instanceStyle; // <float rotation, vec3 color>
+layout (location = 3) in vec4 instanceUV;    // <vec2 top-left, vec2 bottom-right> texture region
+
+out vec2 TexCoords;
+out vec3 SpriteColor;
+
+layout (std140) uniform Matrices {
+    mat4 projection;
+};
+
+void main() {
+    TexCoords = mix(instanceUV.xy, instanceUV.zw, vertex.zw);
+    SpriteColor = instanceStyle.yzw;
+
+    // same transform as the model matrix of sprite.vs: scale the unit quad,
+    // rotate it around its center and move it into place
+    vec2 local = (vertex.xy - 0.5) * instanceRect.zw;
+    float s = sin(instanceStyle.x);
+    float c = cos(instanceStyle.x);
+    local = vec2(c * local.x - s * local.y, s * local.x + c * local.y);
+    gl_Position = projection * vec4(instanceRect.xy + 0.5 * instanceRect.zw + local, 0.0, 1.0);
+}
@@ -8,7 +8,9 @@ uniform sampler2D text;
 uniform vec3 textColor;
 
 void main() {    
-    vec4 sampled = vec4(1.0, 1.0, 1.0, texture(text, TexCoords).r);
-    color = vec4(textColor, 1.0) * sampled;
+    // signed distance field: 0.5 lies on the glyph outline, antialias over about a pixel
+    float distance = texture(text, TexCoords).r;
+    float width = fwidth(distance);
+    float alpha = smoothstep(0.5 - width, 0.5 + width, distance);
+    color = vec4(textColor, alpha);
 }  
-
@@ -4,10 +4,13 @@ layout (location = 0) in vec4 vertex; // <vec2 pos, vec2 tex>
 
 out vec2 TexCoords;
 
-uniform mat4 projection;
+layout (std140) uniform Matrices {
+    mat4 projection;
+};
+uniform vec2 offset; // screen position of the string
 
 void main() {
-    gl_Position = projection * vec4(vertex.xy, 0.0, 1.0);
+    gl_Position = projection * vec4(vertex.xy + offset, 0.0, 1.0);
     TexCoords = vertex.zw;
 } 
 
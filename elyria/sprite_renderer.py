@@ -1,14 +1,30 @@
 from OpenGL.GL import *
+from elyria.gl_state import GLState
 from elyria.shader import Shader
 from elyria.texture2d import Texture2D
+from typing import Optional
 import glm
 import numpy as np
 
 
+# number of floats uploaded per sprite instance:
+# <vec2 position, vec2 size> <float rotation, vec3 color> <vec4 uv rect>
+INSTANCE_FLOATS = 12
+
+
 class SpriteRenderer:
-    def __init__(self, shader: Shader) -> None:
+    def __init__(self, shader: Shader, instanced_shader: Optional[Shader] = None) -> None:
         self.shader = shader
+        self.instanced_shader = instanced_shader
         self.quad_vao = None
+        self.quad_vbo = None
+        self.instance_vao = None
+        self.instance_vbo = None
+
+        # sprites submitted since begin(), in runs of consecutive sprites sharing a texture
+        self.batches: list[tuple[Texture2D, list[tuple]]] = []
+        self.batching = False
+
         self.init_render_data()
 
     def draw_sprite(
@@ -19,6 +35,11 @@ class SpriteRenderer:
         rotate: float = 0.0,
         color: glm.vec3 = glm.vec3(1.0)
     ) -> None:
+        # while a batch is open, sprites are only recorded and drawn on flush()
+        if self.batching:
+            self.submit(texture, position, size, rotate, color)
+            return
+
         # prepare transformations
         self.shader.use()
 
@@ -33,13 +54,97 @@ class SpriteRenderer:
 
         self.shader.set_mat4("model", model)
         self.shader.set_vec3("spriteColor", color)
+        self.shader.set_vec4("uvRect", texture.uv_rect)
 
-        glActiveTexture(GL_TEXTURE0)
+        GLState.active_texture(GL_TEXTURE0)
         texture.bind()
 
-        glBindVertexArray(self.quad_vao)
+        GLState.bind_vertex_array(self.quad_vao)
         glDrawArrays(GL_TRIANGLES, 0, 6)
-        glBindVertexArray(0)
+
+    # opens a batch: every sprite drawn until flush() is packed into an instance
+    # buffer and drawn with one instanced call per run of sprites sharing a
+    # texture, so the draw order is kept
+    def begin(self) -> None:
+        if self.instanced_shader is not None:
+            self.batches.clear()
+            self.batching = True
+
+    # records a sprite in the current batch; it joins the run of the previous
+    # sprite if they share a texture (regions of the same atlas page do)
+    def submit(
+        self,
+        texture: Texture2D,
+        position: glm.vec2,
+        size: glm.vec2 = glm.vec2(10.0, 10.0),
+        rotate: float = 0.0,
+        color: glm.vec3 = glm.vec3(1.0)
+    ) -> None:
+        if not self.batches or self.batches[-1][0].id != texture.id:
+            self.batches.append((texture, []))
+        self.batches[-1][1].append(self.instance(texture, position, size, rotate, color))
+
+    # draws a static batch in between the sprites of the current batch
+    def draw_static(self, batch: "StaticSpriteBatch") -> None:
+        batching = self.batching
+        self.flush()
+        batch.draw()
+        if batching:
+            self.begin()
+
+    # returns the per-instance attributes of a sprite
+    @staticmethod
+    def instance(
+        texture: Texture2D,
+        position: glm.vec2,
+        size: glm.vec2,
+        rotate: float,
+        color: glm.vec3
+    ) -> tuple:
+        uv = texture.uv_rect
+        return (
+            position.x, position.y, size.x, size.y,
+            glm.radians(rotate), color.x, color.y, color.z,
+            uv.x, uv.y, uv.z, uv.w
+        )
+
+    # draws all sprites recorded since begin(), in submission order, and closes the batch
+    def flush(self) -> None:
+        if not self.batching:
+            return
+        self.batching = False
+        if not self.batches:
+            return
+
+        # upload the instances of every run at once, in order
+        groups = self.batches
+        self.batches = []
+        instances = np.array(
+            [instance for _, group in groups for instance in group],
+            dtype=np.float32
+        )
+
+        self.instanced_shader.use()
+        GLState.active_texture(GL_TEXTURE0)
+        GLState.bind_vertex_array(self.instance_vao)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        glBufferData(GL_ARRAY_BUFFER, instances.nbytes, instances, GL_STREAM_DRAW)
+
+        # then point the instance attributes at each run in turn
+        first = 0
+        for texture, group in groups:
+            self.set_instance_attributes(first * INSTANCE_FLOATS * instances.itemsize)
+            texture.bind()
+            glDrawArraysInstanced(GL_TRIANGLES, 0, 6, len(group))
+            first += len(group)
+
+    # configures the per-instance attributes of the instance vao, starting at
+    # the given byte offset of the (bound) instance buffer
+    def set_instance_attributes(self, offset: int) -> None:
+        stride = INSTANCE_FLOATS * 4
+        glVertexAttribPointer(1, 4, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(offset))
+        glVertexAttribPointer(2, 4, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(offset + 4 * 4))
+        glVertexAttribPointer(3, 4, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(offset + 8 * 4))
 
     def init_render_data(self) -> None:
         vertices = np.array([
@@ -47,21 +152,113 @@ class SpriteRenderer:
             0.0, 1.0, 0.0, 1.0,
             1.0, 0.0, 1.0, 0.0,
             0.0, 0.0, 0.0, 0.0,
-            
+
             0.0, 1.0, 0.0, 1.0,
             1.0, 1.0, 1.0, 1.0,
             1.0, 0.0, 1.0, 0.0
         ], dtype=np.float32)
 
         self.quad_vao = glGenVertexArrays(1)
-        vbo = glGenBuffers(1)
+        self.quad_vbo = glGenBuffers(1)
 
-        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.quad_vbo)
         glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
 
-        glBindVertexArray(self.quad_vao)
+        GLState.bind_vertex_array(self.quad_vao)
         glEnableVertexAttribArray(0)
         glVertexAttribPointer(0, 4, GL_FLOAT, GL_FALSE, 4 * vertices.itemsize, None)
 
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
-        glBindVertexArray(0)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, 0)
+        GLState.bind_vertex_array(0)
+
+        if self.instanced_shader is not None:
+            self.instance_vbo = glGenBuffers(1)
+            GLState.bind_buffer(GL_ARRAY_BUFFER, self.instance_vbo)
+            glBufferData(GL_ARRAY_BUFFER, 0, None, GL_STREAM_DRAW)
+            self.instance_vao = self.create_instance_vao(self.instance_vbo)
+
+    # creates a vao drawing the quad mesh once per instance stored in instance_vbo
+    def create_instance_vao(self, instance_vbo: int) -> int:
+        vao = glGenVertexArrays(1)
+        GLState.bind_vertex_array(vao)
+
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.quad_vbo)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 4, GL_FLOAT, GL_FALSE, 4 * 4, None)
+
+        GLState.bind_buffer(GL_ARRAY_BUFFER, instance_vbo)
+        glEnableVertexAttribArray(1)
+        glEnableVertexAttribArray(2)
+        glEnableVertexAttribArray(3)
+        self.set_instance_attributes(0)
+        glVertexAttribDivisor(1, 1)
+        glVertexAttribDivisor(2, 1)
+        glVertexAttribDivisor(3, 1)
+
+        GLState.bind_buffer(GL_ARRAY_BUFFER, 0)
+        GLState.bind_vertex_array(0)
+        return vao
+
+
+# Sprites baked once into a persistent instance buffer, for geometry that never
+# moves such as the bricks of a level. Afterwards sprites can only be hidden,
+# which rewrites their own slot of the buffer; drawing costs one instanced draw
+# per texture, so a single one when all sprites share an atlas page.
+class StaticSpriteBatch:
+    def __init__(self, renderer: SpriteRenderer, sprites: list) -> None:
+        self.renderer = renderer
+
+        # group the sprites per texture so that every group is a contiguous range
+        groups: dict[int, tuple[Texture2D, list]] = {}
+        for sprite in sprites:
+            groups.setdefault(sprite.texture.id, (sprite.texture, []))[1].append(sprite)
+
+        # (texture, first instance, instance count) of every group
+        self.ranges: list[tuple[Texture2D, int, int]] = []
+        # id of a visible sprite -> its instance slot
+        self.slots: dict[int, int] = {}
+        rows = []
+        for texture, group in groups.values():
+            self.ranges.append((texture, len(rows), len(group)))
+            for sprite in group:
+                self.slots[id(sprite)] = len(rows)
+                rows.append(SpriteRenderer.instance(
+                    texture, sprite.position, sprite.size, sprite.rotation, sprite.color
+                ))
+        self.instances = np.array(rows, dtype=np.float32).reshape(-1, INSTANCE_FLOATS)
+
+        self.vbo = glGenBuffers(1)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.instances.nbytes, self.instances, GL_DYNAMIC_DRAW)
+        self.vao = renderer.create_instance_vao(self.vbo)
+
+    # hides a sprite by collapsing its instance to a zero sized quad
+    def hide(self, sprite) -> None:
+        slot = self.slots.pop(id(sprite), None)
+        if slot is None:
+            return
+        self.instances[slot, 2:4] = 0.0
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferSubData(
+            GL_ARRAY_BUFFER,
+            self.instances.strides[0] * slot + 2 * self.instances.itemsize,
+            2 * self.instances.itemsize,
+            self.instances[slot, 2:4]
+        )
+
+    def draw(self) -> None:
+        if not self.ranges:
+            return
+        self.renderer.instanced_shader.use()
+        GLState.active_texture(GL_TEXTURE0)
+        GLState.bind_vertex_array(self.vao)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.vbo)
+        for texture, first, count in self.ranges:
+            self.renderer.set_instance_attributes(first * self.instances.strides[0])
+            texture.bind()
+            glDrawArraysInstanced(GL_TRIANGLES, 0, 6, count)
+
+    # releases the GPU buffers of the batch
+    def delete(self) -> None:
+        GLState.delete_vertex_array(self.vao)
+        GLState.delete_buffer(self.vbo)
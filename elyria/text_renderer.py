@@ -1,25 +1,39 @@
 import os
 import glm
-import freetype
+from collections import OrderedDict
+from typing import Optional
 import numpy as np
 from OpenGL.GL import *
+from elyria.gl_state import GLState
 from elyria import base_dir
 from elyria.resource_manager import ResourceManager
 from elyria.texture2d import Texture2D
+from elyria.texture_atlas import ShelfPacker
 from elyria.shader import Shader
+from elyria.font_cache import (
+    ATLAS_SIZE, SDF_SIZE, font_cache_file, rasterize_glyph, read_font_cache, write_font_cache
+)
 
 
-# Holds all state information relevant to a character as loaded using FreeType
+# empty pixels around every glyph of the atlas
+GLYPH_PADDING = 1
+
+# number of string layouts kept on the GPU
+LAYOUT_CACHE_SIZE = 64
+
+
+# Holds all state information relevant to a character as loaded using FreeType;
+# sizes are in pixels of the SDF_SIZE atlas glyphs and cover their distance field
 class Character:
     def __init__(
         self,
-        texture_id: int,
+        uv_rect: glm.vec4,
         size: glm.ivec2,
         bearing: glm.ivec2,
         advance: int
     ):
-        # ID handle of the glyph texture
-        self.texture_id = texture_id
+        # <vec2 top-left, vec2 bottom-right> texture coordinates of the glyph in the atlas
+        self.uv_rect = uv_rect
         # size of glyph
         self.size = size
         # offset from baseline to left/top of glyph
@@ -28,13 +42,73 @@ class Character:
         self.advance = advance
 
 
+# The quads of a laid out string, kept in their own vertex buffer so that an
+# unchanged string is drawn again without any layout work or upload.
+class TextLayout:
+    def __init__(self, vertices: np.ndarray):
+        self.count = 6 * len(vertices)
+
+        self.vao = glGenVertexArrays(1)
+        self.vbo = glGenBuffers(1)
+        GLState.bind_vertex_array(self.vao)
+        GLState.bind_buffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 4, GL_FLOAT, GL_FALSE, 4 * 4, None)
+
+    def draw(self) -> None:
+        if self.count == 0:
+            return
+        GLState.bind_vertex_array(self.vao)
+        glDrawArrays(GL_TRIANGLES, 0, self.count)
+
+    # releases the GPU buffers of the layout
+    def delete(self) -> None:
+        GLState.delete_vertex_array(self.vao)
+        GLState.delete_buffer(self.vbo)
+
+
 # A renderer class for rendering text displayed by a font loaded using the
 # FreeType library. A single font is loaded, processed into a list of Character
-# items for later rendering
+# items for later rendering. All glyphs are stored as signed distance fields in
+# a single atlas texture, so a string is drawn with one upload and one draw
+# call, sharp at any size. The atlas is generated once per font and cached on
+# disk; later runs memory-map it without importing FreeType. The layouts
+# of recently drawn strings stay on the GPU (least recently used ones are
+# dropped first), so redrawing them costs a single draw call.
 class TextRenderer:
-    def __init__(self, width: int, height: int):
+    def __init__(self, width: int, height: int, cache_size: int = LAYOUT_CACHE_SIZE):
         # holds a list of pre-compiled Characters
         self.characters: dict[str, Character] = {}
+        # same glyph data, one row per character for vectorized layout:
+        # <bearing x, bearing y, width, height, advance (pixels), u0, v0, u1, v1>
+        self.glyph_index: dict[str, int] = {}
+        self.metrics = np.zeros((0, 9), dtype=np.float32)
+        # characters neither the font nor the atlas has room for, without a '?' to draw instead
+        self.missing: set[str] = set()
+
+        # font face, only opened to rasterize glyphs that aren't cached
+        self.face = None
+        self.atlas: Texture2D = None
+        self.packer: ShelfPacker = None
+        # CPU copy of the atlas, written to the cache; on warm starts the cached
+        # atlas is only copied once a glyph is added to it
+        self.pixels: np.ndarray = None
+        self.cached_pixels: np.ndarray = None
+        # font cache file and the codepoint of every metrics row
+        self.cache_file: str = None
+        self.codepoints: list[int] = []
+        # whether glyphs were added since the cache was written
+        self.dirty = False
+        # (font, size) currently loaded
+        self.font: tuple[str, int] = None
+        # scale from the atlas glyphs to the loaded font size
+        self.font_scale = 1.0
+
+        # (text, scale, font) -> layout, least recently drawn first
+        self.layouts: OrderedDict[tuple[str, float, tuple[str, int]], TextLayout] = OrderedDict()
+        self.cache_size = cache_size
+
         # load and configure shader
         self.text_shader = ResourceManager.load_shader(
             "text",
@@ -42,116 +116,245 @@ class TextRenderer:
             os.path.join(base_dir, "shaders", "text_2d.fs")
         )
         self.text_shader.use()
-        projection = glm.ortho(0.0, float(width), float(height), 0.0)
-        self.text_shader.set_mat4("projection", projection)
         self.text_shader.set_int("text", 0)
 
-        # configure vao / vbo for texture quads
-        self.vao = glGenVertexArrays(1)
-        self.vbo = glGenBuffers(1)
-        glBindVertexArray(self.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, 6 * 6 * 4, None, GL_DYNAMIC_DRAW)
-        glEnableVertexAttribArray(0)
-        glVertexAttribPointer(0, 4, GL_FLOAT, GL_FALSE, 4 * 4, None)
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
-        glBindVertexArray(0)
+        # the projection lives in the shared "Matrices" uniform block; only
+        # create it when no game set it up before us
+        matrices = ResourceManager.get_uniform_buffer("Matrices")
+        if matrices is None:
+            matrices = ResourceManager.load_uniform_buffer("Matrices", glm.sizeof(glm.mat4), 0)
+            matrices.set_mat4(0, glm.ortho(0.0, float(width), float(height), 0.0))
+        matrices.attach(self.text_shader)
 
     # pre-compiles a list of characters from the given font
     def load(self, font: str, font_size: int) -> None:
-        # first clear the previously loaded Characters
+        # first clear the previously loaded Characters
         self.characters.clear()
-
-        # load font as face
-        face: freetype.Face = freetype.Face(font)
-
-        # set size to load glyphs as
-        face.set_pixel_sizes(font_size, font_size)
+        self.glyph_index.clear()
+        self.metrics = np.zeros((0, 9), dtype=np.float32)
+        self.missing.clear()
+        self.codepoints = []
+        self.pixels = None
+        self.cached_pixels = None
+        self.dirty = False
+        self.clear_layouts()
+        self.font = (font, font_size)
+        self.font_scale = font_size / SDF_SIZE
+        self.face = None
 
         # disable byte-alignment restriction
         glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
 
+        if self.atlas is None:
+            self.atlas = Texture2D(
+                ATLAS_SIZE,
+                ATLAS_SIZE,
+                internal_format=GL_RED,
+                image_format=GL_RED,
+                wrap_s=GL_CLAMP_TO_EDGE,
+                wrap_t=GL_CLAMP_TO_EDGE
+            )
+        self.packer = ShelfPacker(ATLAS_SIZE, ATLAS_SIZE)
+
+        self.cache_file = font_cache_file(font)
+        cached = read_font_cache(self.cache_file)
+        if cached is not None:
+            codepoints, metrics, pixels, used_height = cached
+            self.atlas.generate(pixels)
+            self.cached_pixels = pixels
+            self.codepoints = [int(codepoint) for codepoint in codepoints]
+            # glyphs loaded on demand go below the cached ones
+            self.packer.top = used_height
+            self.metrics = np.array(metrics, dtype=np.float32)
+            for index, (codepoint, row) in enumerate(zip(codepoints, self.metrics)):
+                self.glyph_index[chr(codepoint)] = index
+                self.characters[chr(codepoint)] = Character(
+                    uv_rect=glm.vec4(*row[5:9]),
+                    size=glm.ivec2(int(row[2]), int(row[3])),
+                    bearing=glm.ivec2(int(row[0]), int(row[1])),
+                    advance=int(row[4]) << 6
+                )
+            return
+
+        # (re)create an empty atlas
+        self.pixels = np.zeros((ATLAS_SIZE, ATLAS_SIZE), dtype=np.uint8)
+        self.atlas.generate(self.pixels)
+
         # Then for the first 128 ASCII characters, pre-load / compile their characters and store them
         for c in range(128):
-            # load character glyph
-            if face.load_char(c, freetype.FT_LOAD_RENDER):
-                print(f"ERROR::FREETYPE: Failed to load {c} Glyph")
-                continue
-
-            # generate texture
-            texture = glGenTextures(1)
-            glBindTexture(GL_TEXTURE_2D, texture)
-            glTexImage2D(
-                GL_TEXTURE_2D,
-                0,
-                GL_RED,
-                face.glyph.bitmap.width,
-                face.glyph.bitmap.rows,
-                0,
-                GL_RED,
-                GL_UNSIGNED_BYTE,
-                face.glyph.bitmap.buffer
-            )
+            self.load_glyph(chr(c))
+        self.save_cache()
 
-            # set texture options
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-
-            # now store character for later use
-            self.characters[chr(c)] = Character(
-                texture_id=texture,
-                size=glm.ivec2(face.glyph.bitmap.width, face.glyph.bitmap.rows),
-                bearing=glm.ivec2(face.glyph.bitmap_left, face.glyph.bitmap_top),
-                advance=face.glyph.advance.x
-            )
-        
-        glBindTexture(GL_TEXTURE_2D, 0)
+    # writes the atlas to the font cache if glyphs were added to it, so that
+    # later runs find them without FreeType
+    def save_cache(self) -> None:
+        if not self.dirty:
+            return
+        try:
+            write_font_cache(self.cache_file, self.codepoints, self.metrics, self.writable_pixels(), self.packer.top)
+        except OSError as e:
+            print(f"ERROR::FONT: Failed to write font cache {self.cache_file}\n{e}")
+        self.dirty = False
+
+    # returns the CPU copy of the atlas, copying it out of the memory-mapped
+    # cache (which is then let go, so the cache file can be replaced)
+    def writable_pixels(self) -> np.ndarray:
+        if self.pixels is None:
+            self.pixels = np.array(self.cached_pixels)
+            self.cached_pixels = None
+        return self.pixels
+
+    # opens the font face at the atlas glyph size
+    def open_face(self):
+        if self.face is None:
+            import freetype
+
+            # load font as face
+            self.face = freetype.Face(self.font[0])
+
+            # set size to load glyphs as
+            self.face.set_pixel_sizes(SDF_SIZE, SDF_SIZE)
+        return self.face
+
+    # rasterizes a character into the atlas; returns False if it couldn't be loaded
+    def load_glyph(self, c: str) -> bool:
+        # load character glyph
+        glyph = rasterize_glyph(self.open_face(), c)
+        if glyph is None:
+            print(f"ERROR::FREETYPE: Failed to load {ord(c)} Glyph")
+            return False
+
+        field, (bearing_x, bearing_y, advance) = glyph
+        height, width = field.shape
+
+        # copy the distance field into a free spot of the atlas
+        x, y = 0, 0
+        if width > 0 and height > 0:
+            position = self.packer.insert(width + 2 * GLYPH_PADDING, height + 2 * GLYPH_PADDING)
+            if position is None:
+                print(f"ERROR::FREETYPE: No space left in the glyph atlas for {ord(c)} Glyph")
+                return False
+            x = position[0] + GLYPH_PADDING
+            y = position[1] + GLYPH_PADDING
+
+            self.atlas.bind()
+            glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, width, height, GL_RED, GL_UNSIGNED_BYTE, field)
+            self.writable_pixels()[y:y + height, x:x + width] = field
+
+        uv_rect = glm.vec4(
+            x / ATLAS_SIZE,
+            y / ATLAS_SIZE,
+            (x + width) / ATLAS_SIZE,
+            (y + height) / ATLAS_SIZE
+        )
+
+        # now store character for later use
+        character = Character(
+            uv_rect=uv_rect,
+            size=glm.ivec2(width, height),
+            bearing=glm.ivec2(bearing_x, bearing_y),
+            advance=advance << 6
+        )
+        self.characters[c] = character
+        self.add_metrics(c, np.array([
+            bearing_x, bearing_y,
+            width, height,
+            advance,
+            uv_rect.x, uv_rect.y, uv_rect.z, uv_rect.w
+        ], dtype=np.float32))
+        return True
+
+    # appends the metrics row of a character, to be written to the cache
+    def add_metrics(self, c: str, row: np.ndarray) -> None:
+        self.glyph_index[c] = len(self.metrics)
+        self.codepoints.append(ord(c))
+        self.metrics = np.vstack((self.metrics, row[None, :]))
+        self.dirty = True
+
+    # returns the metrics row of a character, loading it on demand; characters
+    # the font can't provide are drawn as '?', or skipped (None) without one
+    def glyph(self, c: str) -> Optional[int]:
+        index = self.glyph_index.get(c)
+        if index is None:
+            if c in self.missing:
+                return None
+            if self.load_glyph(c):
+                return self.glyph_index[c]
+            fallback = self.glyph_index.get('?')
+            if fallback is None:
+                self.missing.add(c)
+                return None
+            # cached as a copy of '?', so it isn't looked up in the font again
+            self.add_metrics(c, self.metrics[fallback])
+            if '?' in self.characters:
+                self.characters[c] = self.characters['?']
+            index = self.glyph_index[c]
+        return index
+
+    # builds the quads of a whole string: returns an array of 6 vertices
+    # <vec2 pos, vec2 tex> per character
+    def layout(self, text: str, x: float, y: float, scale: float) -> np.ndarray:
+        indices = [self.glyph(c) for c in text]
+        glyphs = self.metrics[[index for index in indices if index is not None]]
+        scale *= self.font_scale
+
+        # pen position of every character
+        advance = glyphs[:, 4] * scale
+        pen = x + np.cumsum(advance) - advance
+
+        xpos = pen + glyphs[:, 0] * scale
+        cap_height = self.metrics[self.glyph_index['H'], 1] if 'H' in self.glyph_index else SDF_SIZE
+        ypos = y + (cap_height - glyphs[:, 1]) * scale
+        w = glyphs[:, 2] * scale
+        h = glyphs[:, 3] * scale
+        u0, v0, u1, v1 = glyphs[:, 5], glyphs[:, 6], glyphs[:, 7], glyphs[:, 8]
+
+        return np.stack([
+            np.stack([xpos,     ypos + h, u0, v1], axis=1),
+            np.stack([xpos + w, ypos,     u1, v0], axis=1),
+            np.stack([xpos,     ypos,     u0, v0], axis=1),
+
+            np.stack([xpos,     ypos + h, u0, v1], axis=1),
+            np.stack([xpos + w, ypos + h, u1, v1], axis=1),
+            np.stack([xpos + w, ypos,     u1, v0], axis=1)
+        ], axis=1).astype(np.float32)
+
+    # returns the GPU layout of a string, laid out at the origin; only strings
+    # that aren't cached yet are laid out and uploaded
+    def cached_layout(self, text: str, scale: float) -> TextLayout:
+        key = (text, scale, self.font)
+        layout = self.layouts.get(key)
+        if layout is not None:
+            self.layouts.move_to_end(key)
+            return layout
+
+        layout = TextLayout(self.layout(text, 0.0, 0.0, scale))
+        # keep glyphs the string added for the next runs
+        self.save_cache()
+        self.layouts[key] = layout
+        if len(self.layouts) > self.cache_size:
+            _, evicted = self.layouts.popitem(last=False)
+            evicted.delete()
+        return layout
+
+    # drops all cached layouts
+    def clear_layouts(self) -> None:
+        for layout in self.layouts.values():
+            layout.delete()
+        self.layouts.clear()
 
     # renders a string of text using the precompiled list of characters
     def render_text(self, text: str, x: float, y: float, scale: float, color: glm.vec3 = glm.vec3(1.0)):
+        if not text:
+            return
+        layout = self.cached_layout(text, scale)
+
         # activate corresponding render state
         self.text_shader.use()
-        self.text_shader.set_vec3("text_color", color)
-        glActiveTexture(GL_TEXTURE0)
-        glBindVertexArray(self.vao)
-
-        # iterate through all characters
-        for c in text:
-            ch = self.characters[c]
-
-            xpos = x + ch.bearing.x * scale
-            ypos = y + (self.characters['H'].bearing.y - ch.bearing.y) * scale
-
-            w = ch.size.x * scale
-            h = ch.size.y * scale
-
-            # update VBO for each character
-            vertices = np.array([
-                [xpos,     ypos + h,   0.0, 1.0],
-                [xpos + w, ypos,       1.0, 0.0],
-                [xpos,     ypos,       0.0, 0.0],
-
-                [xpos,     ypos + h,   0.0, 1.0],
-                [xpos + w, ypos + h,   1.0, 1.0],
-                [xpos + w, ypos,       1.0, 0.0]
-            ], dtype=np.float32)
-
-            # render glyph texture over quad
-            glBindTexture(GL_TEXTURE_2D, ch.texture_id)
-
-            # update content of vbo memory
-            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-            glBufferSubData(GL_ARRAY_BUFFER, 0, vertices.nbytes, vertices)
-            glBindBuffer(GL_ARRAY_BUFFER, 0)
-
-            # render quad
-            glDrawArrays(GL_TRIANGLES, 0, 6)
-
-            # now advance cursor for next glyph
-            x += (ch.advance >> 6) * scale  # bitshift by 6 to get value in pixels (1/64th times 2^6 = 64)
-        
-        glBindVertexArray(0)
-        glBindTexture(GL_TEXTURE_2D, 0)
-        
\ No newline at end of file
+        self.text_shader.set_vec3("textColor", color)
+        self.text_shader.set_vec2("offset", glm.vec2(x, y))
+        GLState.active_texture(GL_TEXTURE0)
+        self.atlas.bind()
+
+        # render all quads at once
+        layout.draw()
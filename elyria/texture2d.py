@@ -1,4 +1,6 @@
+import glm
 from OpenGL.GL import *
+from elyria.gl_state import GLState
 
 
 class Texture2D:
@@ -30,9 +32,13 @@ class Texture2D:
         self.filter_min = filter_min  # filtering mode if texture pixels < screen pixels
         self.filter_max = filter_max  # filtering mode if texture pixels > screen pixels
 
+        # <vec2 top-left, vec2 bottom-right> texture coordinates sampled by sprites;
+        # the whole texture, unlike atlas regions (see SubTexture2D)
+        self.uv_rect = glm.vec4(0.0, 0.0, 1.0, 1.0)
+
     def generate(self, data):        
         # bind texture
-        glBindTexture(GL_TEXTURE_2D, self.id)
+        GLState.bind_texture(self.id)
         glTexImage2D(GL_TEXTURE_2D, 0, self.internal_format, self.width, self.height, 0, self.image_format, GL_UNSIGNED_BYTE, data)
 
         # set texture wrap and filter modes
@@ -42,7 +48,7 @@ class Texture2D:
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, self.filter_max)
 
         # unbind texture
-        glBindTexture(GL_TEXTURE_2D, 0)
+        GLState.bind_texture(0)
 
     def bind(self):
-        glBindTexture(GL_TEXTURE_2D, self.id)
+        GLState.bind_texture(self.id)
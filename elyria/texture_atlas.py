@@ -0,0 +1,122 @@
+import math
+import glm
+import numpy as np
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from elyria.texture2d import Texture2D
+
+
+# A rectangular region of a texture atlas page. It can be used wherever a
+# Texture2D is expected: it binds its atlas page and exposes the uv rectangle
+# the sprite shaders use to sample the region.
+class SubTexture2D:
+    def __init__(self, atlas: "Texture2D", x: int, y: int, width: int, height: int):
+        # atlas page holding the region
+        self.atlas = atlas
+
+        # region position and size in pixels
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+        # <vec2 top-left, vec2 bottom-right> texture coordinates of the region
+        self.uv_rect = glm.vec4(
+            x / atlas.width,
+            y / atlas.height,
+            (x + width) / atlas.width,
+            (y + height) / atlas.height
+        )
+
+    @property
+    def id(self) -> int:
+        return self.atlas.id
+
+    def bind(self) -> None:
+        self.atlas.bind()
+
+
+# Packs rectangles into a fixed size area, row by row: each shelf is as high as
+# the first rectangle placed on it and later rectangles go on the lowest shelf
+# they fit in. Rectangles can be inserted one at a time (e.g. glyphs loaded on
+# demand); for a known set, inserting them sorted by decreasing height packs best.
+class ShelfPacker:
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+
+        # [y, height, next free x] of every shelf
+        self.shelves: list[list[int]] = []
+        # y of the next shelf to open
+        self.top = 0
+        # widest extent used by any shelf
+        self.used_width = 0
+
+    # reserves a width x height rectangle and returns its top-left corner, or
+    # None if it doesn't fit anymore
+    def insert(self, width: int, height: int) -> Optional[tuple[int, int]]:
+        best = None
+        for shelf in self.shelves:
+            y, shelf_height, x = shelf
+            if height <= shelf_height and x + width <= self.width:
+                if best is None or shelf_height < best[1]:
+                    best = shelf
+
+        if best is None:
+            # open a new shelf
+            if width > self.width or self.top + height > self.height:
+                return None
+            best = [self.top, height, 0]
+            self.shelves.append(best)
+            self.top += height
+
+        position = (best[2], best[0])
+        best[2] += width
+        self.used_width = max(self.used_width, best[2])
+        return position
+
+
+# Packs RGBA images into as few atlas pages as needed. Every image is surrounded
+# by padding pixels repeating its border, so that linear filtering never bleeds
+# neighbouring regions into it. Returns the page images and, for every input
+# image, the (page, x, y) position of its region.
+def pack_images(
+    images: list[np.ndarray],
+    padding: int = 2,
+    max_size: int = 2048
+) -> tuple[list[np.ndarray], list[tuple[int, int, int]]]:
+    if not images:
+        return [], []
+
+    padded = [(image.shape[1] + 2 * padding, image.shape[0] + 2 * padding) for image in images]
+    for (width, height) in padded:
+        if width > max_size or height > max_size:
+            raise ValueError(f"image of {width}x{height} (padded) does not fit in a {max_size}x{max_size} atlas")
+
+    # aim for a roughly square page, a power of two wide
+    area = sum(width * height for width, height in padded)
+    page_width = 1 << math.ceil(math.log2(max(math.sqrt(area), max(width for width, _ in padded))))
+    page_width = min(page_width, max_size)
+
+    # place the tallest images first
+    order = sorted(range(len(images)), key=lambda i: (-padded[i][1], -padded[i][0]))
+    packers = [ShelfPacker(page_width, max_size)]
+    placements: list[Optional[tuple[int, int, int]]] = [None] * len(images)
+    for i in order:
+        width, height = padded[i]
+        position = packers[-1].insert(width, height)
+        if position is None:
+            packers.append(ShelfPacker(page_width, max_size))
+            position = packers[-1].insert(width, height)
+        placements[i] = (len(packers) - 1, position[0] + padding, position[1] + padding)
+
+    # copy the (edge-extended) images into pages cropped to the space actually used
+    pages = [np.zeros((packer.top, packer.used_width, 4), dtype=np.uint8) for packer in packers]
+    for image, (page, x, y) in zip(images, placements):
+        height, width = image.shape[:2]
+        pages[page][y - padding:y + height + padding, x - padding:x + width + padding] = np.pad(
+            image, ((padding, padding), (padding, padding), (0, 0)), mode="edge"
+        )
+
+    return pages, placements
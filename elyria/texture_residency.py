@@ -0,0 +1,204 @@
+import glm
+import numpy as np
+from OpenGL.GL import GL_RGBA
+from collections import OrderedDict
+from elyria.gl_state import GLState
+from elyria.texture2d import Texture2D
+from typing import Callable, Optional
+
+
+# GPU memory textures managed by a TextureResidency may use, in bytes
+DEFAULT_TEXTURE_BUDGET = 256 * 1024 * 1024
+
+
+# Bookkeeping of a managed texture: where to load it from and whether it's resident
+class ResidentTexture:
+    def __init__(self, file: str, alpha: bool):
+        self.file = file
+        self.alpha = alpha
+        # uploaded texture, None while evicted
+        self.texture: Optional[Texture2D] = None
+        # GPU memory used while resident, in bytes
+        self.size = 0
+        # outstanding handles
+        self.references = 0
+        # frame the texture was last used in
+        self.last_frame = -1
+        # whether the texture was resident before (loading it again is a reload)
+        self.loaded = False
+        # whether loading it failed; the placeholder stands in for it
+        self.failed = False
+
+
+# A reference to a managed texture that can be used wherever a Texture2D is
+# expected. Using it (id, bind) makes the texture resident again if it was
+# evicted, or gives the placeholder if it can't be loaded; release() gives the
+# reference up.
+class TextureHandle:
+    def __init__(self, residency: "TextureResidency", name: str):
+        self.residency = residency
+        self.name = name
+        # <vec2 top-left, vec2 bottom-right> texture coordinates: the whole texture
+        self.uv_rect = glm.vec4(0.0, 0.0, 1.0, 1.0)
+
+    @property
+    def texture(self) -> Texture2D:
+        texture = self.residency.resident(self.name)
+        return texture if texture is not None else self.residency.placeholder()
+
+    @property
+    def id(self) -> int:
+        return self.texture.id
+
+    @property
+    def width(self) -> int:
+        return self.texture.width
+
+    @property
+    def height(self) -> int:
+        return self.texture.height
+
+    def bind(self) -> None:
+        self.texture.bind()
+
+    def release(self) -> None:
+        self.residency.release(self.name)
+
+
+# Keeps managed textures within a GPU memory budget. Textures are loaded on
+# first use; when the resident ones exceed the budget, the least recently used
+# are evicted (textures without references first, those used in the current
+# frame never) and loaded again from their source, or the pixel cache, when
+# next used.
+class TextureResidency:
+    def __init__(
+        self,
+        loader: Callable[[str, bool], Optional[Texture2D]],
+        budget: int = DEFAULT_TEXTURE_BUDGET
+    ):
+        # loads a texture from (file, alpha)
+        self.loader = loader
+        self.budget = budget
+
+        self.entries: dict[str, ResidentTexture] = {}
+        # names of the resident textures, least recently used first
+        self.lru: OrderedDict[str, None] = OrderedDict()
+        self.frame = 0
+
+        # stands in for textures that fail to load, created on first need
+        self.missing: Optional[Texture2D] = None
+
+        # statistics
+        self.resident_bytes = 0
+        self.evictions = 0
+        self.reloads = 0
+
+    # registers a texture source under a name and returns a handle to it; the
+    # texture is only loaded once used
+    def register(self, name: str, file: str, alpha: bool) -> TextureHandle:
+        entry = self.entries.get(name)
+        if entry is None or (entry.file, entry.alpha) != (file, alpha):
+            if entry is not None and entry.texture is not None:
+                self.unload(name)
+            references = entry.references if entry is not None else 0
+            entry = self.entries[name] = ResidentTexture(file, alpha)
+            entry.references = references
+        return self.acquire(name)
+
+    # returns a new handle to a registered texture
+    def acquire(self, name: str) -> TextureHandle:
+        self.entries[name].references += 1
+        return TextureHandle(self, name)
+
+    # gives up a reference; unreferenced textures are evicted before referenced ones
+    def release(self, name: str) -> None:
+        entry = self.entries.get(name)
+        if entry is None or entry.references == 0:
+            return
+        entry.references -= 1
+
+    # returns the uploaded texture, loading it when it isn't resident, or None
+    # if it can't be loaded
+    def resident(self, name: str) -> Optional[Texture2D]:
+        entry = self.entries[name]
+        if entry.texture is None:
+            if entry.failed:
+                return None
+            texture = self.loader(entry.file, entry.alpha)
+            if texture is None:
+                # don't try again every time it's used
+                print(f"ERROR::TEXTURE: Failed to load managed texture {name} from {entry.file}")
+                entry.failed = True
+                return None
+            if entry.loaded:
+                self.reloads += 1
+            entry.texture = texture
+            entry.loaded = True
+            entry.size = texture.width * texture.height * (4 if entry.alpha else 3)
+            self.resident_bytes += entry.size
+            self.lru[name] = None
+            entry.last_frame = self.frame
+            self.evict()
+        else:
+            self.lru.move_to_end(name)
+            entry.last_frame = self.frame
+        return entry.texture
+
+    # evicts textures until the budget is met: the least recently used of the
+    # unreferenced ones first, then of the referenced ones
+    def evict(self) -> None:
+        while self.resident_bytes > self.budget:
+            name = self.victim(False) or self.victim(True)
+            if name is None:
+                # everything resident is used this frame
+                return
+            self.unload(name)
+            self.evictions += 1
+
+    # the least recently used texture, with or without references, that isn't
+    # used in the current frame
+    def victim(self, referenced: bool) -> Optional[str]:
+        for name in self.lru:
+            entry = self.entries[name]
+            if (entry.references > 0) == referenced and entry.last_frame != self.frame:
+                return name
+        return None
+
+    # a 1x1 magenta texture standing in for textures that fail to load
+    def placeholder(self) -> Texture2D:
+        if self.missing is None:
+            self.missing = Texture2D(1, 1, GL_RGBA, GL_RGBA)
+            self.missing.generate(np.array([[[255, 0, 255, 255]]], dtype=np.uint8))
+        return self.missing
+
+    # frees the GPU memory of a resident texture
+    def unload(self, name: str) -> None:
+        entry = self.entries[name]
+        GLState.delete_texture(entry.texture.id)
+        self.resident_bytes -= entry.size
+        entry.texture = None
+        entry.size = 0
+        del self.lru[name]
+
+    # starts a new frame; textures used in the previous one may be evicted again
+    def begin_frame(self) -> None:
+        self.frame += 1
+
+    # returns the resident bytes, budget, resident texture count, evictions and reloads
+    def stats(self) -> dict[str, int]:
+        return {
+            "resident_bytes": self.resident_bytes,
+            "budget": self.budget,
+            "resident": len(self.lru),
+            "evictions": self.evictions,
+            "reloads": self.reloads
+        }
+
+    # frees every resident texture and forgets all sources
+    def clear(self) -> None:
+        for name in list(self.lru):
+            self.unload(name)
+        self.entries.clear()
+        if self.missing is not None:
+            GLState.delete_texture(self.missing.id)
+            self.missing = None
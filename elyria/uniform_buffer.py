@@ -0,0 +1,41 @@
+import glm
+from OpenGL.GL import *
+from elyria.gl_state import GLState
+from elyria.shader import Shader
+
+
+# A uniform buffer object holding a std140 uniform block shared by several
+# shader programs (e.g. the per-frame projection matrix). Values are written
+# once into the buffer instead of once per program, and writes of unchanged
+# values are skipped.
+class UniformBuffer:
+    def __init__(self, name: str, size: int, binding: int):
+        # name of the uniform block in the shaders
+        self.name = name
+        # size of the block in bytes
+        self.size = size
+        # uniform buffer binding point the block is attached to
+        self.binding = binding
+        # byte offset -> last written value
+        self.values: dict[int, object] = {}
+
+        self.id = glGenBuffers(1)
+        GLState.bind_buffer(GL_UNIFORM_BUFFER, self.id)
+        glBufferData(GL_UNIFORM_BUFFER, size, None, GL_DYNAMIC_DRAW)
+        GLState.bind_buffer(GL_UNIFORM_BUFFER, 0)
+        GLState.bind_buffer_base(GL_UNIFORM_BUFFER, binding, self.id)
+
+    # makes the shader's uniform block read from this buffer
+    def attach(self, shader: Shader) -> None:
+        shader.bind_uniform_block(self.name, self.binding)
+
+    # writes a matrix at the given (std140) byte offset of the block
+    def set_mat4(self, offset: int, mat: glm.mat4) -> None:
+        previous = self.values.get(offset)
+        if previous is not None and previous == mat:
+            return
+        self.values[offset] = glm.mat4(mat)
+
+        GLState.bind_buffer(GL_UNIFORM_BUFFER, self.id)
+        glBufferSubData(GL_UNIFORM_BUFFER, offset, glm.sizeof(glm.mat4), glm.value_ptr(mat))
+        GLState.bind_buffer(GL_UNIFORM_BUFFER, 0)